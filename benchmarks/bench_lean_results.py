@@ -0,0 +1,83 @@
+# benchmarks/bench_lean_results.py
+"""
+Compara memoria y tiempo de construcción de OcrResult (pydantic) frente a
+LeanOcrResult (``__slots__``) para un resultado con muchas páginas.
+
+Uso: python benchmarks/bench_lean_results.py [--pages 20000] [--repeat 5]
+"""
+import argparse
+import gc
+import json
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from pisco_mistral_ocr.lean import LeanChatCompletionResult, LeanOcrResult
+from pisco_mistral_ocr.models import ChatCompletionResult, OcrResult
+
+
+def ocr_payload(pages: int) -> Dict[str, Any]:
+    return {
+        "model": "mistral-ocr-latest",
+        "pages": [
+            {
+                "index": i,
+                "markdown": f"# Page {i}\n\nLorem ipsum dolor sit amet, item {i}.",
+                "images": [],
+                "dimensions": {"dpi": 200, "height": 2200, "width": 1700},
+            }
+            for i in range(pages)
+        ],
+        "usage_info": {"pages_processed": pages, "doc_size_bytes": 123456},
+    }
+
+
+def chat_payload() -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-1", "created": 1700000000, "model": "mistral-small-latest",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "Hola"}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    }
+
+
+def retained_bytes(model: Any, raw: str) -> int:
+    """
+    Bytes still allocated after parsing ``raw`` into ``model``, as in the client:
+    the decoded JSON is dropped and only what the result references survives.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = model.model_validate(json.loads(raw))
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return after - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    ocr = ocr_payload(args.pages)
+    chat = chat_payload()
+    # (modelo, payload, repeticiones, páginas por llamada)
+    cases = [
+        (OcrResult, ocr, args.repeat, args.pages),
+        (LeanOcrResult, ocr, args.repeat, args.pages),
+        (ChatCompletionResult, chat, 20000, 1),
+        (LeanChatCompletionResult, chat, 20000, 1),
+    ]
+    print(f"{'model':<26}{'build (us/page)':>17}{'memory (B/page)':>17}")
+    for model, payload, number, per_call in cases:
+        build: Callable[[], Any] = lambda: model.model_validate(payload)
+        seconds = min(timeit.repeat(build, number=number, repeat=3)) / number
+        memory = retained_bytes(model, json.dumps(payload))
+        print(f"{model.__name__:<26}{seconds / per_call * 1e6:>17.2f}{memory / per_call:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
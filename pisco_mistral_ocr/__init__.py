@@ -1,28 +1,94 @@
 # pisco_mistral_ocr/__init__.py
-# (El código anterior está bien, nos aseguramos de que los modelos y excepciones necesarios estén)
 """
 PiscoMistralOcr: Un cliente asíncrono fácil de usar para las APIs de OCR y
 Comprensión de Documentos de Mistral AI.
+
+Solo las excepciones se importan al cargar el paquete; el cliente (httpx), los
+modelos (pydantic) y las utilidades se cargan al acceder a ellos por primera vez.
 """
-from .client import PiscoMistralOcrClient
+from typing import TYPE_CHECKING, Any, Dict, List
+
 from .exceptions import (
-    PiscoMistralOcrError, ApiError, NetworkError, FileError, ConfigurationError
-)
-from .models import (
-    OcrResult, ChatCompletionResult, OcrPage, ChatMessage, ChatCompletionChoice,
-    FileUploadResponse, SignedUrlResponse, FileDeleteResponse # Asegúrate que todos los necesarios están
+    PiscoMistralOcrError, ApiError, NetworkError, FileError, ConfigurationError,
+    CircuitOpenError, BudgetExceededError, DeadlineExceededError
 )
 
+if TYPE_CHECKING: # Para IDEs y type checkers; no se ejecuta en tiempo de import
+    from .client import PiscoMistralOcrClient
+    from .models import (
+        OcrResult, ChatCompletionResult, OcrPage, ChatMessage, ChatCompletionChoice,
+        FileUploadResponse, SignedUrlResponse, FileDeleteResponse
+    )
+    from .resilience import HedgingPolicy
+    from .postprocess import PostProcessor
+    from .usage import UsageBudget
+    from .store import OcrResultStore
+    from .pipeline import OcrPipeline
+    from .page_cache import PageCache
+    from .deadline import Deadline
+    from .lean import LeanOcrResult, LeanOcrPage, LeanChatCompletionResult
+
 __version__ = "0.1.1" # Incrementar versión por la nueva funcionalidad
 
+# Atributo público -> submódulo que lo define
+_LAZY_ATTRIBUTES: Dict[str, str] = {
+    "PiscoMistralOcrClient": ".client",
+    "HedgingPolicy": ".resilience",
+    "PostProcessor": ".postprocess",
+    "UsageBudget": ".usage",
+    "OcrResultStore": ".store",
+    "OcrPipeline": ".pipeline",
+    "PageCache": ".page_cache",
+    "Deadline": ".deadline",
+    "LeanOcrResult": ".lean",
+    "LeanOcrPage": ".lean",
+    "LeanChatCompletionResult": ".lean",
+    "OcrResult": ".models",
+    "ChatCompletionResult": ".models",
+    "OcrPage": ".models",
+    "ChatMessage": ".models",
+    "ChatCompletionChoice": ".models",
+    "FileUploadResponse": ".models",
+    "SignedUrlResponse": ".models",
+    "FileDeleteResponse": ".models",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value # Cachear: las siguientes búsquedas no pasan por __getattr__
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
 __all__ = [
     "PiscoMistralOcrClient",
+    "HedgingPolicy",
+    "PostProcessor",
+    "UsageBudget",
+    "OcrResultStore",
+    "OcrPipeline",
+    "PageCache",
+    "Deadline",
+    "LeanOcrResult",
+    "LeanOcrPage",
+    "LeanChatCompletionResult",
     # Exceptions
     "PiscoMistralOcrError",
     "ApiError",
     "NetworkError",
     "FileError",
     "ConfigurationError",
+    "CircuitOpenError",
+    "BudgetExceededError",
+    "DeadlineExceededError",
     # Models (Exportar los principales y componentes útiles)
     "OcrResult",
     "ChatCompletionResult",
@@ -30,4 +96,4 @@ __all__ = [
     "ChatMessage",
     "ChatCompletionChoice",
     # Probablemente no necesites exportar los de archivos/URL/delete
-]
\ No newline at end of file
+]
@@ -0,0 +1,136 @@
+# pisco_mistral_ocr/admission.py
+"""
+Control de admisión por bytes en vuelo (subidas + respuestas) para acotar la memoria.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ByteReservation:
+    """A block of bytes admitted by a :class:`ByteBudget`. Release it when done."""
+
+    __slots__ = ("_budget", "nbytes", "released")
+
+    def __init__(self, budget: "ByteBudget", nbytes: int):
+        self._budget = budget
+        self.nbytes = nbytes
+        self.released = False
+
+    def resize(self, nbytes: int) -> None:
+        """
+        Adjusts the reservation to ``nbytes`` (e.g. once the upload is done or
+        the real response size is known). Growing never waits: the work is
+        already admitted, so it may push usage above the limit temporarily.
+        """
+        if self.released:
+            return
+        nbytes = max(nbytes, 0)
+        self._budget._adjust(nbytes - self.nbytes)
+        self.nbytes = nbytes
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._budget._adjust(-self.nbytes)
+
+
+class ByteBudget:
+    """
+    Admission controller limiting the bytes held by in-flight calls.
+
+    Reservations are admitted in FIFO order while they fit in ``max_bytes``.
+    A single reservation larger than the whole budget is admitted once nothing
+    else is in flight, so oversized documents are serialised instead of failing.
+    """
+
+    def __init__(self, max_bytes: int):
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be positive.")
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.admitted = 0
+        self._waiters: Deque[Tuple[int, "asyncio.Future[None]"]] = deque()
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.in_use == 0 or self.in_use + nbytes <= self.max_bytes
+
+    def _admit(self, nbytes: int) -> ByteReservation:
+        self.admitted += 1
+        self._adjust(nbytes, wake=False)
+        return ByteReservation(self, nbytes)
+
+    def _adjust(self, delta: int, wake: bool = True) -> None:
+        self.in_use += delta
+        self.peak = max(self.peak, self.in_use)
+        if wake and delta < 0:
+            self._wake()
+
+    def _wake(self) -> None:
+        # FIFO estricto: un documento grande no queda postergado indefinidamente
+        while self._waiters:
+            nbytes, waiter = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(nbytes):
+                return
+            self._waiters.popleft()
+            self._adjust(nbytes, wake=False)
+            waiter.set_result(None)
+
+    async def reserve(self, nbytes: int) -> ByteReservation:
+        """Waits until ``nbytes`` fit in the budget and returns the reservation."""
+        nbytes = max(int(nbytes), 0)
+        if not self._waiters and self._fits(nbytes):
+            return self._admit(nbytes)
+
+        logger.debug(
+            "Holding back %d bytes: %d/%d bytes in flight",
+            nbytes, self.in_use, self.max_bytes,
+        )
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._waiters.append((nbytes, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._adjust(-nbytes) # Admitido justo antes de cancelar
+            raise
+        self.admitted += 1
+        return ByteReservation(self, nbytes)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_bytes": self.max_bytes,
+            "in_use": self.in_use,
+            "peak": self.peak,
+            "waiting": sum(1 for _, waiter in self._waiters if not waiter.done()),
+            "admitted": self.admitted,
+        }
+
+
+class ResponseSizeEstimator:
+    """
+    Estimates response sizes from observed ones (exponential moving average per
+    kind of call), falling back to a default until something has been observed.
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._averages: Dict[str, float] = {}
+
+    def observe(self, kind: str, nbytes: int) -> None:
+        current = self._averages.get(kind)
+        if current is None:
+            self._averages[kind] = float(nbytes)
+        else:
+            self._averages[kind] = current + self.alpha * (nbytes - current)
+
+    def estimate(self, kind: str, default: int) -> int:
+        observed: Optional[float] = self._averages.get(kind)
+        return int(observed) if observed is not None else default
@@ -1,29 +1,48 @@
 # pisco_mistral_ocr/client.py
+import asyncio
+import hashlib
 import httpx
 import os
+import time
 import mimetypes
 import logging # Importar logging
-from typing import Optional, Type, Dict, Any, Union, Tuple # Añadir Tuple
+from typing import ( # Añadir Tuple
+    Optional, Type, Dict, Any, List, Set, Union, Tuple, Awaitable, Callable, TypeVar
+)
 from types import TracebackType
 
 from .exceptions import (
-    PiscoMistralOcrError, ApiError, ConfigurationError, NetworkError, FileError
+    PiscoMistralOcrError, ApiError, ConfigurationError, NetworkError, FileError,
+    CircuitOpenError, BudgetExceededError, DeadlineExceededError
 )
 from .models import (
     OcrResult, ChatCompletionResult, FileUploadResponse, SignedUrlResponse,
     FileDeleteResponse, # Importar nuevo modelo
-    BaseMistralModel
 )
+from .resilience import CircuitBreaker, HedgingPolicy, endpoint_key
+from .scheduler import RequestScheduler
+from .admission import ByteBudget, ByteReservation, ResponseSizeEstimator
+from .usage import CHAT, OCR, UsageAccountant, UsageBudget, UsageReservation
+from .store import OcrResultStore
+from .ranking import select_relevant_pages
+from .page_cache import PageCache, PagePlan, page_fingerprints, write_page_subset
+from .deadline import Deadline
+from .lean import LeanChatCompletionResult, LeanOcrResult
 
 # Configurar un logger básico para la librería
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 # Re-export exceptions
 PiscoMistralOcrError = PiscoMistralOcrError
 ApiError = ApiError
 ConfigurationError = ConfigurationError
 NetworkError = NetworkError
 FileError = FileError
+CircuitOpenError = CircuitOpenError
+BudgetExceededError = BudgetExceededError
+DeadlineExceededError = DeadlineExceededError
 
 
 class PiscoMistralOcrClient:
@@ -38,6 +57,16 @@ class PiscoMistralOcrClient:
         default_ocr_model: str = DEFAULT_OCR_MODEL,
         default_chat_model: str = DEFAULT_CHAT_MODEL,
         timeout: float = 60.0,
+        hedging_policy: Optional[HedgingPolicy] = None,
+        circuit_breaker_threshold: Optional[int] = None,
+        circuit_breaker_recovery_time: float = 30.0,
+        max_concurrency: Optional[int] = None,
+        traffic_class_weights: Optional[Dict[str, float]] = None,
+        requests_per_second: Optional[float] = None,
+        max_bytes_in_flight: Optional[int] = None,
+        usage_budgets: Optional[List[UsageBudget]] = None,
+        result_store: Optional[OcrResultStore] = None,
+        page_cache: Optional[PageCache] = None,
     ):
         self.api_key = api_key or os.getenv("MISTRAL_API_KEY")
         if not self.api_key:
@@ -48,6 +77,32 @@ class PiscoMistralOcrClient:
         self.base_url = base_url
         self.default_ocr_model = default_ocr_model
         self.default_chat_model = default_chat_model
+        # Hedging solo se aplica a peticiones idempotentes (URL firmada, OCR sobre URLs)
+        self.hedging_policy = hedging_policy
+        self.circuit_breaker_threshold = circuit_breaker_threshold
+        self.circuit_breaker_recovery_time = circuit_breaker_recovery_time
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # Borrados y almacenamiento que siguen en segundo plano (llamadas con deadline)
+        self._background_tasks: Set["asyncio.Future[None]"] = set()
+        # El planificador solo se crea si hay un presupuesto global que repartir
+        self._scheduler: Optional[RequestScheduler] = None
+        if max_concurrency is not None or requests_per_second is not None:
+            self._scheduler = RequestScheduler(
+                max_concurrency=max_concurrency,
+                weights=traffic_class_weights,
+                requests_per_second=requests_per_second,
+            )
+        # Presupuesto de memoria: bytes de subidas y respuestas en vuelo
+        self._byte_budget: Optional[ByteBudget] = (
+            ByteBudget(max_bytes_in_flight) if max_bytes_in_flight is not None else None
+        )
+        self._response_sizes = ResponseSizeEstimator()
+        # Uso acumulado (páginas/tokens) durante la vida del cliente
+        self.usage = UsageAccountant(usage_budgets)
+        # Si se configura, cada OcrResult se persiste e indexa (FTS5)
+        self.result_store = result_store
+        # Caché por página para PDFs locales (requiere pypdf)
+        self.page_cache = page_cache
 
         self._client = httpx.AsyncClient(
             base_url=self.base_url,
@@ -69,75 +124,327 @@ class PiscoMistralOcrClient:
     ) -> None:
         await self.aclose()
 
-    async def aclose(self): # ... (sin cambios) ...
-        await self._client.aclose()
+    async def aclose(self):
+        try:
+            if self._background_tasks:
+                # Terminar borrados y escrituras pendientes antes de cerrar la conexión
+                await asyncio.gather(*self._background_tasks, return_exceptions=True)
+            if self.result_store is not None:
+                # No perder los resultados que siguen en el buffer del almacén
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.result_store.flush
+                )
+        finally:
+            await self._client.aclose()
 
-    async def _request( # ... (sin cambios en la lógica principal, solo añadir logging) ...
-        self,
-        method: str,
-        endpoint: str,
-        response_model: Optional[Type[BaseMistralModel]] = None, # Hacer opcional para DELETE
-        **kwargs
-    ) -> Union[BaseMistralModel, Dict[str, Any], None]: # Puede devolver None para DELETE
-        if 'json' in kwargs and 'headers' not in kwargs:
-             kwargs['headers'] = {'Content-Type': 'application/json'}
-        elif 'json' in kwargs and 'Content-Type' not in kwargs.get('headers', {}):
-             if 'headers' not in kwargs: kwargs['headers'] = {}
-             kwargs['headers']['Content-Type'] = 'application/json'
+    def _breaker_for(self, key: str) -> Optional[CircuitBreaker]:
+        """Returns the circuit breaker for an endpoint key, or None if disabled."""
+        if self.circuit_breaker_threshold is None:
+            return None
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(
+                key,
+                failure_threshold=self.circuit_breaker_threshold,
+                recovery_time=self.circuit_breaker_recovery_time,
+            )
+        return breaker
 
-        try:
-            logger.debug("Sending API request: %s %s", method, endpoint)
-            response = await self._client.request(method, endpoint, **kwargs)
-            logger.debug("Received API response: Status %d", response.status_code)
-            response.raise_for_status()
+    def circuit_states(self) -> Dict[str, str]:
+        """Returns the current circuit state (closed/open/half_open) per endpoint."""
+        return {key: breaker.state for key, breaker in self._breakers.items()}
 
-            # Handle successful deletion (e.g., 200 OK with body or 204 No Content)
-            if method.upper() == "DELETE":
-                if response.status_code == 204:
-                    logger.debug("File deleted successfully (204 No Content).")
-                    return None # O un objeto FileDeleteResponse(deleted=True) si prefieres
-                # Si hay cuerpo, intenta parsearlo
-                if not response.content: # Check if body is empty even on 200
-                    logger.debug("File deleted successfully (200 OK, empty body).")
-                    return None # O un objeto FileDeleteResponse(deleted=True)
+    def scheduler_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns per traffic class metrics: queue_depth, in_flight, dispatched,
+        avg_wait and max_wait (seconds). Empty if no scheduler is configured.
+        """
+        return self._scheduler.stats() if self._scheduler is not None else {}
 
-            # If response_model is None (e.g. for DELETE with no expected body), return None
-            if response_model is None:
-                 return None # Or the raw response if preferred for some reason
+    def byte_budget_stats(self) -> Dict[str, int]:
+        """
+        Returns max_bytes, in_use, peak, waiting and admitted counters of the
+        bytes-in-flight budget. Empty if no budget is configured.
+        """
+        return self._byte_budget.stats() if self._byte_budget is not None else {}
+
+    # Respuesta esperada por tipo de llamada hasta observar respuestas reales
+    _DEFAULT_RESPONSE_BYTES = {
+        "ocr_images": 4 * 1024 * 1024,
+        "ocr_text": 256 * 1024,
+        "chat": 16 * 1024,
+    }
+
+    def _expected_response_bytes(self, kind: str, upload_size: int) -> int:
+        if kind == "ocr_images" and upload_size:
+            # Las imágenes vuelven en base64 (~4/3 del tamaño original)
+            return max(upload_size * 4 // 3, self._response_sizes.estimate(kind, 0))
+        return self._response_sizes.estimate(kind, self._DEFAULT_RESPONSE_BYTES[kind])
 
+    async def _reserve_bytes(
+        self, file_path: Optional[str], kind: str
+    ) -> Tuple[Optional[ByteReservation], int]:
+        """
+        Waits for room in the byte budget for the upload (if any) plus the
+        expected response, twice if /ocr may be hedged. Returns
+        (reservation, expected_response_bytes).
+        """
+        if self._byte_budget is None:
+            return None, 0
+        upload_size = 0
+        if file_path is not None:
             try:
-                response_data = response.json()
-                logger.debug("Parsing response into %s", response_model.__name__)
-                return response_model.model_validate(response_data)
-            except Exception as e:
-                logger.warning(
-                    "Failed to parse response into %s: %s. Response: %s",
-                    response_model.__name__, e, response.text, exc_info=True
+                upload_size = os.stat(file_path).st_size
+            except OSError as e:
+                raise FileError(f"Could not read file {file_path}: {e}") from e
+        expected = self._expected_response_bytes(kind, upload_size)
+        if kind != "chat" and self.hedging_policy is not None:
+            # Un duplicado (hedging) de /ocr puede bufferizar una segunda
+            # respuesta completa
+            expected *= 2
+        reservation = await self._byte_budget.reserve(upload_size + expected)
+        return reservation, expected
+
+    def _release_bytes(
+        self, reservation: Optional[ByteReservation], kind: str, observed: bool
+    ) -> None:
+        if reservation is None:
+            return
+        if observed:
+            self._response_sizes.observe(kind, reservation.nbytes)
+        reservation.release()
+
+    @staticmethod
+    def _file_sha256(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _in_background(self, awaitable: Awaitable[None]) -> None:
+        """Runs ``awaitable`` as a task that :meth:`aclose` waits for."""
+        task = asyncio.ensure_future(awaitable)
+        self._background_tasks.add(task) # Mantener una referencia hasta que termine
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _store_result(
+        self,
+        result: Union[OcrResult, LeanOcrResult],
+        source: str,
+        is_file: bool,
+        deadline: Optional[Deadline] = None,
+    ) -> None:
+        """
+        Persists an OCR result in the result store without blocking the event
+        loop. With a deadline it is stored in the background: hashing a large
+        file must not delay the result past the budget.
+        """
+        if self.result_store is None:
+            return
+        if deadline is not None:
+            self._in_background(self._store_result(result, source, is_file))
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            content_hash = None
+            if is_file:
+                content_hash = await loop.run_in_executor(
+                    None, self._file_sha256, source
                 )
-                return response.json() # Return raw dict as fallback
+            await loop.run_in_executor(
+                None, self.result_store.add, result, source, content_hash
+            )
+        except Exception as e:
+            # El almacenamiento es accesorio: no debe ocultar un OCR exitoso
+            logger.warning(
+                "Failed to store OCR result for %s: %s", source, e, exc_info=True
+            )
 
+    async def _send(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        """Sends a single HTTP request, mapping httpx errors to library exceptions."""
+        try:
+            logger.debug("Sending API request: %s %s", method, endpoint)
+            response = await self._client.request(method, endpoint, **kwargs)
+            logger.debug("Received API response: Status %d", response.status_code)
+            response.raise_for_status()
+            return response
         except httpx.HTTPStatusError as e:
             error_details = {}
             try:
                 error_details = e.response.json()
             except Exception:
-                error_details = {"message": e.response.text or "No error details available"}
-            logger.error("API Error %d: %s", e.response.status_code, error_details, exc_info=True)
+                error_details = {
+                    "message": e.response.text or "No error details available"
+                }
+            logger.error(
+                "API Error %d: %s", e.response.status_code, error_details,
+                exc_info=True
+            )
             raise ApiError(e.response.status_code, error_details) from e
         except httpx.RequestError as e:
-            logger.error("Network request to %s failed: %s", e.request.url, e, exc_info=True)
+            logger.error(
+                "Network request to %s failed: %s", e.request.url, e, exc_info=True
+            )
             raise NetworkError(f"Network request to {e.request.url} failed: {e}") from e
+
+    async def _timed_send(
+        self, key: str, method: str, endpoint: str, **kwargs
+    ) -> httpx.Response:
+        """Sends one HTTP request and records its latency for the hedging policy."""
+        started = time.monotonic()
+        response = await self._send(method, endpoint, **kwargs)
+        if self.hedging_policy is not None:
+            # Solo el tiempo de red: la espera en el scheduler no es latencia
+            # del servidor
+            self.hedging_policy.record(key, time.monotonic() - started)
+        return response
+
+    async def _send_scheduled(
+        self,
+        traffic_class: Optional[str],
+        send: Callable[[], Awaitable[httpx.Response]],
+    ) -> httpx.Response:
+        """Runs one attempt inside its own scheduler slot, if there is a scheduler."""
+        if self._scheduler is None:
+            return await send()
+        async with self._scheduler.slot(traffic_class):
+            return await send()
+
+    async def _perform(
+        self, key: str, method: str, endpoint: str, hedge: bool,
+        traffic_class: Optional[str] = None, **kwargs
+    ) -> httpx.Response:
+        """Sends the request, hedged if allowed, and records its latency."""
+        def send() -> Awaitable[httpx.Response]:
+            return self._timed_send(key, method, endpoint, **kwargs)
+
+        policy = self.hedging_policy
+        if not hedge or policy is None:
+            return await self._send_scheduled(traffic_class, send)
+        if self._scheduler is None:
+            return await policy.run(key, send, record=False)
+        # El retardo del hedging cuenta desde que el intento original tiene su slot:
+        # esperar en cola no indica un servidor lento y no debe disparar duplicados
+        held = [await self._scheduler.acquire(traffic_class)]
+
+        def release() -> None:
+            if held:
+                self._scheduler.release(held.pop())
+
+        async def original() -> httpx.Response:
+            try:
+                return await send()
+            finally:
+                release()
+
+        try:
+            # El duplicado espera su propio slot
+            return await policy.run(
+                key, original,
+                lambda: self._send_scheduled(traffic_class, send),
+                record=False,
+            )
+        finally:
+            release() # Por si se canceló antes de que arrancara el intento original
+
+    # ... (sin cambios en la lógica principal, solo añadir logging) ...
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        # Modelo pydantic o Lean*; opcional para DELETE
+        response_model: Optional[Type[Any]] = None,
+        hedge: bool = False, # Solo para peticiones idempotentes
+        traffic_class: Optional[str] = None,
+        reservation: Optional[ByteReservation] = None,
+        deadline: Optional[Deadline] = None,
+        phase: Optional[str] = None,
+        **kwargs
+    ) -> Any: # Modelo, dict crudo o None para DELETE
+        if 'json' in kwargs and 'headers' not in kwargs:
+             kwargs['headers'] = {'Content-Type': 'application/json'}
+        elif 'json' in kwargs and 'Content-Type' not in kwargs.get('headers', {}):
+             if 'headers' not in kwargs: kwargs['headers'] = {}
+             kwargs['headers']['Content-Type'] = 'application/json'
+
+        key = endpoint_key(method, endpoint)
+        breaker = self._breaker_for(key)
+
+        try:
+            if breaker is not None:
+                breaker.before_call()
+            # La espera en cola y los duplicados (hedging) también consumen presupuesto
+            response = await self._run_phase(
+                deadline, phase or key,
+                self._perform(key, method, endpoint, hedge, traffic_class, **kwargs)
+            )
+        except (asyncio.CancelledError, DeadlineExceededError):
+            if breaker is not None:
+                breaker.on_cancel()
+            raise
+        except CircuitOpenError:
+            logger.warning("Failing fast: circuit open for %s", key)
+            raise
+        except (ApiError, NetworkError) as e:
+            if breaker is not None:
+                if CircuitBreaker.counts_as_failure(e):
+                    breaker.on_failure()
+                else:
+                    breaker.on_success() # Un 4xx demuestra que el endpoint responde
+            raise
         except Exception as e:
-            logger.exception("An unexpected error occurred during API request.") # Log full traceback
+            if breaker is not None:
+                breaker.on_failure()
+            # Log full traceback
+            logger.exception("An unexpected error occurred during API request.")
             raise PiscoMistralOcrError(f"An unexpected error occurred: {e}") from e
+        if breaker is not None:
+            breaker.on_success()
+        if reservation is not None:
+            # Contabilizar el tamaño real de la respuesta mientras se parsea
+            reservation.resize(len(response.content))
 
-    # MODIFICADO: Devuelve Tuple[str, str] (signed_url, file_id)
-    async def _handle_file_upload(self, file_path: str) -> Tuple[str, str]:
-        """Uploads file, returns (signed_url, file_id)."""
+        # Handle successful deletion (e.g., 200 OK with body or 204 No Content)
+        if method.upper() == "DELETE":
+            if response.status_code == 204:
+                logger.debug("File deleted successfully (204 No Content).")
+                return None # O un objeto FileDeleteResponse(deleted=True) si prefieres
+            # Si hay cuerpo, intenta parsearlo
+            if not response.content: # Check if body is empty even on 200
+                logger.debug("File deleted successfully (200 OK, empty body).")
+                return None # O un objeto FileDeleteResponse(deleted=True)
+
+        # If response_model is None (e.g. for DELETE with no expected body), return None
+        if response_model is None:
+             return None # Or the raw response if preferred for some reason
+
+        try:
+            response_data = response.json()
+            logger.debug("Parsing response into %s", response_model.__name__)
+            return response_model.model_validate(response_data)
+        except Exception as e:
+            logger.warning(
+                "Failed to parse response into %s: %s. Response: %s",
+                response_model.__name__, e, response.text, exc_info=True
+            )
+            try:
+                return response.json() # Return raw dict as fallback
+            except ValueError as json_error:
+                raise PiscoMistralOcrError(
+                    f"An unexpected error occurred: {json_error}"
+                ) from json_error
+
+    async def _upload_file(
+        self,
+        file_path: str,
+        traffic_class: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> str:
+        """Uploads a local file for OCR and returns its file ID."""
         filename = os.path.basename(file_path)
         mime_type, _ = mimetypes.guess_type(file_path)
         mime_type = mime_type or 'application/octet-stream'
-        file_id: Optional[str] = None # Para el finally
 
         try:
             logger.info("Uploading file: %s", file_path)
@@ -146,21 +453,15 @@ class PiscoMistralOcrClient:
                 data = {'purpose': 'ocr'}
                 upload_resp = await self._request(
                     "POST", "/files", response_model=FileUploadResponse,
-                    files=files, data=data, headers={}
+                    files=files, data=data, headers={}, traffic_class=traffic_class,
+                    deadline=deadline, phase="upload"
                 )
                 if not isinstance(upload_resp, FileUploadResponse):
-                     raise PiscoMistralOcrError(f"Failed to parse file upload response: {upload_resp}")
-                file_id = upload_resp.id
-                logger.info("File uploaded successfully. File ID: %s", file_id)
-
-            logger.info("Getting signed URL for file ID: %s", file_id)
-            signed_url_resp = await self._request(
-                "GET", f"/files/{file_id}/url", response_model=SignedUrlResponse
-            )
-            if not isinstance(signed_url_resp, SignedUrlResponse):
-                raise PiscoMistralOcrError(f"Failed to parse signed URL response: {signed_url_resp}")
-            logger.info("Obtained signed URL successfully.")
-            return signed_url_resp.url, file_id # Devolver ambos
+                     raise PiscoMistralOcrError(
+                         f"Failed to parse file upload response: {upload_resp}"
+                     )
+                logger.info("File uploaded successfully. File ID: %s", upload_resp.id)
+                return upload_resp.id
 
         except FileNotFoundError:
             logger.error("Local file not found for upload: %s", file_path)
@@ -170,16 +471,89 @@ class PiscoMistralOcrClient:
             raise FileError(f"Could not read file {file_path}: {e}") from e
         # ApiError, NetworkError son manejados y logueados por _request
 
+    async def _get_signed_url(
+        self,
+        file_id: str,
+        traffic_class: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> str:
+        """Returns a signed URL for an uploaded file."""
+        logger.info("Getting signed URL for file ID: %s", file_id)
+        signed_url_resp = await self._request(
+            "GET", f"/files/{file_id}/url", response_model=SignedUrlResponse,
+            hedge=True, traffic_class=traffic_class, deadline=deadline,
+            phase="signed_url"
+        )
+        if not isinstance(signed_url_resp, SignedUrlResponse):
+            raise PiscoMistralOcrError(
+                f"Failed to parse signed URL response: {signed_url_resp}"
+            )
+        logger.info("Obtained signed URL successfully.")
+        return signed_url_resp.url
+
+    # MODIFICADO: Devuelve Tuple[str, str] (signed_url, file_id)
+    async def _handle_file_upload(
+        self,
+        file_path: str,
+        traffic_class: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Tuple[str, str]:
+        """Uploads file, returns (signed_url, file_id)."""
+        file_id = await self._upload_file(
+            file_path, traffic_class=traffic_class, deadline=deadline
+        )
+        signed_url = await self._get_signed_url(
+            file_id, traffic_class=traffic_class, deadline=deadline
+        )
+        return signed_url, file_id # Devolver ambos
+
+    async def _delete_after_processing(
+        self, file_id: str, operation: str, traffic_class: Optional[str] = None
+    ) -> None:
+        logger.info("Attempting post-%s deletion for file ID: %s", operation, file_id)
+        try:
+            await self.delete_file(file_id, traffic_class=traffic_class)
+        except Exception as e:
+            # Loguear el error de borrado pero NO relanzarlo para no ocultar el
+            # resultado/error original
+            logger.warning(
+                "Failed to delete file %s after %s processing: %s",
+                file_id, operation, e, exc_info=True # Añadir traceback al log
+            )
+
+    async def _cleanup_file(
+        self,
+        file_id: str,
+        operation: str,
+        traffic_class: Optional[str],
+        deadline: Optional[Deadline],
+    ) -> None:
+        """
+        Deletes an uploaded file after ``operation``. With a deadline the deletion
+        runs in the background so it never delays the result or the timeout;
+        :meth:`aclose` waits for deletions still pending.
+        """
+        if deadline is None:
+            await self._delete_after_processing(file_id, operation, traffic_class)
+            return
+        self._in_background(
+            self._delete_after_processing(file_id, operation, traffic_class)
+        )
+
     # NUEVO: Método para eliminar archivo
-    async def delete_file(self, file_id: str) -> bool:
+    async def delete_file(
+        self, file_id: str, traffic_class: Optional[str] = None
+    ) -> bool:
         """
         Deletes a file previously uploaded to Mistral.
 
         Args:
             file_id: The ID of the file to delete.
+            traffic_class: Scheduler traffic class for the request (e.g. "bulk").
 
         Returns:
-            True if deletion was successful, False otherwise (though usually raises error on failure).
+            True if deletion was successful, False otherwise (though usually
+            raises error on failure).
 
         Raises:
             ApiError: If the Mistral API returns an error during deletion.
@@ -191,94 +565,364 @@ class PiscoMistralOcrClient:
             result = await self._request(
                 "DELETE",
                 f"/files/{file_id}",
-                response_model=FileDeleteResponse # Usa el modelo, aunque puede ser None
+                # Usa el modelo, aunque puede ser None
+                response_model=FileDeleteResponse,
+                traffic_class=traffic_class
             )
             # Consideramos éxito si no hubo excepción y la respuesta es None (204)
             # o si es FileDeleteResponse con deleted=True
-            deleted = result is None or (isinstance(result, FileDeleteResponse) and result.deleted)
+            deleted = result is None or (
+                isinstance(result, FileDeleteResponse) and result.deleted
+            )
             if deleted:
                  logger.info("File %s deleted successfully.", file_id)
                  return True
             else:
                  # Esto podría pasar si la API devuelve 200 OK pero un JSON inesperado
-                 logger.warning("File deletion request for %s completed but response indicates not deleted or parsing failed: %s", file_id, result)
+                 logger.warning(
+                     "File deletion request for %s completed but response indicates "
+                     "not deleted or parsing failed: %s", file_id, result
+                 )
                  return False
         except (ApiError, NetworkError) as e:
             logger.error("Failed to delete file %s: %s", file_id, e)
             raise e # Re-lanzar para que el llamador sepa que falló
         except Exception as e:
             logger.exception("Unexpected error during file deletion for %s.", file_id)
-            raise PiscoMistralOcrError(f"Unexpected error deleting file {file_id}: {e}") from e
+            raise PiscoMistralOcrError(
+                f"Unexpected error deleting file {file_id}: {e}"
+            ) from e
 
     
+    @staticmethod
+    def _url_document_type(url: str) -> str:
+        image_exts = ['.png', '.jpg', '.jpeg', '.webp', '.gif']
+        if any(url.lower().endswith(ext) for ext in image_exts):
+            return "image_url"
+        return "document_url"
+
+    async def _run_ocr_request(
+        self,
+        source: str,
+        is_file: bool,
+        doc_type: str,
+        doc_value: str,
+        model: str,
+        include_image_base64: bool,
+        traffic_class: Optional[str] = None,
+        tag: Optional[str] = None,
+        reservation: Optional[ByteReservation] = None,
+        store_result: bool = True,
+        deadline: Optional[Deadline] = None,
+        lean: bool = False,
+        usage_reservation: Optional[UsageReservation] = None,
+    ) -> Union[OcrResult, LeanOcrResult]:
+        """
+        Sends the /ocr request for a document URL, then records and stores the
+        result.
+        """
+        document_payload = {"type": doc_type}
+        if doc_type == "image_url":
+            document_payload["image_url"] = doc_value
+        else:
+            document_payload["document_url"] = doc_value
+
+        payload = {
+            "model": model,
+            "document": document_payload,
+            "include_image_base64": include_image_base64,
+        }
+
+        logger.info("Sending OCR request for source: %s", source)
+        # Idempotente: el documento ya es una URL (pública o firmada)
+        result_model = LeanOcrResult if lean else OcrResult
+        result = await self._request(
+            "POST", "/ocr", response_model=result_model, hedge=True,
+            traffic_class=traffic_class, reservation=reservation,
+            deadline=deadline, phase="ocr", json=payload
+        )
+        if not isinstance(result, result_model):
+             raise PiscoMistralOcrError(
+                 f"OCR request did not return a valid OcrResult: {result}"
+             )
+        self.usage.record_ocr(result, tag, usage_reservation)
+        if store_result:
+            await self._store_result(result, source, is_file, deadline)
+        logger.info("OCR request successful for source: %s", source)
+        return result
+
+    async def _admit(
+        self,
+        call_type: str,
+        tag: Optional[str],
+        file_path: Optional[str],
+        kind: str,
+        estimate: Optional[int] = None,
+    ) -> Tuple[UsageReservation, Optional[ByteReservation], int]:
+        """
+        Waits for the usage budgets and then reserves the expected response bytes.
+        Returns (usage_reservation, byte_reservation, expected_response_bytes).
+        """
+        usage_reservation = await self.usage.admit(call_type, tag, estimate)
+        try:
+            reservation, expected = await self._reserve_bytes(file_path, kind)
+        except BaseException:
+            usage_reservation.release() # También si el deadline cancela la espera
+            raise
+        return usage_reservation, reservation, expected
+
+    @staticmethod
+    async def _run_phase(
+        deadline: Optional[Deadline], phase: str, awaitable: Awaitable[T]
+    ) -> T:
+        """Awaits ``awaitable`` within the deadline, if there is one."""
+        if deadline is None:
+            return await awaitable
+        return await deadline.run(phase, awaitable)
+
+    async def _plan_pages(
+        self, file_path: str, model: str, include_image_base64: bool
+    ) -> Tuple[Optional[PagePlan], str]:
+        """
+        Fingerprints the pages of a local PDF and looks them up in the page cache.
+        Returns the plan and the path to upload: a temporary PDF with only the
+        uncached pages when some are cached. If pypdf cannot handle the file,
+        returns ``(None, file_path)`` and the whole document is OCR'd as usual.
+        """
+        cache = self.page_cache
+        assert cache is not None
+
+        def build_plan() -> PagePlan:
+            # Las búsquedas en la caché leen JSON de disco: fuera del event loop
+            fingerprints = page_fingerprints(file_path)
+            return PagePlan(cache, model, include_image_base64, fingerprints)
+
+        loop = asyncio.get_running_loop()
+        try:
+            plan = await loop.run_in_executor(None, build_plan)
+        except (FileError, ConfigurationError):
+            raise
+        except Exception as e: # PdfReadError y otros errores de PDFs mal formados
+            logger.warning(
+                "Page cache skipped for %s: could not parse the PDF: %s", file_path, e
+            )
+            return None, file_path
+        logger.info(
+            "Page cache: %d of %d pages of %s need OCR",
+            len(plan.missing), len(plan.keys), file_path
+        )
+        if not plan.missing or len(plan.missing) == len(plan.keys):
+            return plan, file_path
+        try:
+            subset_path = await loop.run_in_executor(
+                None, write_page_subset, file_path, plan.missing
+            )
+        except Exception as e:
+            logger.warning(
+                "Page cache skipped for %s: could not split the PDF: %s", file_path, e
+            )
+            return None, file_path
+        return plan, subset_path
+
+    @staticmethod
+    def _cached_result(
+        plan: PagePlan, model: str, lean: bool
+    ) -> Union[OcrResult, LeanOcrResult]:
+        """Builds the result of a PDF whose pages are all in the page cache."""
+        return (LeanOcrResult if lean else OcrResult).model_validate(
+            {"model": model, "pages": plan.assemble([])}
+        )
+
+    @staticmethod
+    def _remove_page_subset(upload_path: str, source: str) -> None:
+        if upload_path != source:
+            try:
+                os.remove(upload_path)
+            except OSError:
+                logger.warning("Could not remove temporary page subset %s", upload_path)
+
+    @staticmethod
+    def _merge_pages(
+        result: Union[OcrResult, LeanOcrResult], plan: PagePlan
+    ) -> Union[OcrResult, LeanOcrResult]:
+        data = result.model_dump(by_alias=True)
+        data["pages"] = plan.assemble([page.model_dump() for page in result.pages])
+        return type(result).model_validate(data)
+
+    async def _assemble_pages(
+        self, result: Union[OcrResult, LeanOcrResult], plan: PagePlan
+    ) -> Union[OcrResult, LeanOcrResult]:
+        """
+        Rebuilds the full OcrResult from the OCR'd page subset and cached pages,
+        writing the new pages to the cache in an executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._merge_pages, result, plan)
+
     async def ocr(
         self,
         source: str,
         model: Optional[str] = None,
         include_image_base64: bool = True,
         delete_after_processing: bool = True, # Nuevo parámetro
-    ) -> OcrResult:
-        """ Performs OCR... (docstring sin cambios excepto añadir el nuevo parámetro) """
+        traffic_class: Optional[str] = None,
+        tag: Optional[str] = None,
+        timeout_budget: Union[float, Deadline, None] = None,
+        lean: bool = False,
+    ) -> Union[OcrResult, LeanOcrResult]:
+        """ Performs OCR... (docstring sin cambios excepto añadir el nuevo parámetro)
+
+        ``timeout_budget`` (seconds, or a shared :class:`Deadline`) bounds the
+        whole call: admission, page cache lookup, upload, signed URL, the /ocr
+        request and page reassembly each get only the time left, and
+        :class:`DeadlineExceededError` names the phase that ran out. Writing to
+        the result store and deleting the uploaded file are not counted: with a
+        budget they continue in the background (see :meth:`aclose`).
+
+        With ``lean=True`` a :class:`LeanOcrResult` is returned instead: the
+        same attributes in ``__slots__`` objects built with minimal validation,
+        much cheaper to keep in memory; ``.to_model()`` gives the OcrResult.
+        """
         model = model or self.default_ocr_model
+        deadline = Deadline.coerce(timeout_budget)
         doc_type: str
         doc_value: str
         file_id_to_delete: Optional[str] = None # Para guardar el ID si subimos archivo
+        size_kind = "ocr_images" if include_image_base64 else "ocr_text"
+        reservation: Optional[ByteReservation] = None
+        usage_reservation: Optional[UsageReservation] = None
+        response_observed = False
+        page_plan: Optional[PagePlan] = None
+        upload_path = source # Un PDF con solo las páginas no cacheadas, si aplica
 
         try:
             is_likely_url = source.startswith(("http://", "https://"))
             is_file = not is_likely_url and os.path.exists(source)
+            is_pdf = is_file and source.lower().endswith(".pdf")
+            if is_pdf and self.page_cache is not None:
+                page_plan, upload_path = await self._run_phase(
+                    deadline, "page_cache",
+                    self._plan_pages(source, model, include_image_base64),
+                )
+                if page_plan is not None and not page_plan.missing:
+                    result = self._cached_result(page_plan, model, lean)
+                    await self._store_result(result, source, is_file, deadline)
+                    return result
+            if is_file or is_likely_url:
+                # Con la caché de páginas se sabe cuántas páginas se van a enviar
+                usage_reservation, reservation, expected_bytes = await self._run_phase(
+                    deadline, "admission", self._admit(
+                        OCR, tag, upload_path if is_file else None, size_kind,
+                        len(page_plan.missing) if page_plan is not None else None
+                    )
+                )
 
             if is_file:
                 logger.info("Processing local file for OCR: %s", source)
                 # Obtener URL firmada Y file_id
-                doc_value, file_id_to_delete = await self._handle_file_upload(source)
+                doc_value, file_id_to_delete = await self._handle_file_upload(
+                    upload_path, traffic_class=traffic_class, deadline=deadline
+                )
+                if reservation is not None:
+                    reservation.resize(expected_bytes) # La subida ya no ocupa memoria
                 doc_type = "document_url"
             elif is_likely_url:
                 logger.info("Processing URL for OCR: %s", source)
                 doc_value = source
-                if any(source.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.webp', '.gif']):
-                     doc_type = "image_url"
-                else:
-                     doc_type = "document_url"
+                doc_type = self._url_document_type(source)
             else:
                 raise ValueError(
                     f"Source '{source}' is not recognized as a valid URL "
                     "or an existing local file path."
                 )
 
-            document_payload = {"type": doc_type}
-            if doc_type == "image_url":
-                document_payload["image_url"] = doc_value
-            else:
-                document_payload["document_url"] = doc_value
-
-            payload = {
-                "model": model,
-                "document": document_payload,
-                "include_image_base64": include_image_base64,
-            }
-
-            logger.info("Sending OCR request for source: %s", source)
-            result = await self._request("POST", "/ocr", response_model=OcrResult, json=payload)
-            if not isinstance(result, OcrResult):
-                 raise PiscoMistralOcrError(f"OCR request did not return a valid OcrResult: {result}")
-            logger.info("OCR request successful for source: %s", source)
+            result = await self._run_ocr_request(
+                source, is_file, doc_type, doc_value, model, include_image_base64,
+                traffic_class=traffic_class, tag=tag, reservation=reservation,
+                store_result=page_plan is None, deadline=deadline, lean=lean,
+                usage_reservation=usage_reservation
+            )
+            response_observed = True
+            if page_plan is not None:
+                result = await self._run_phase(
+                    deadline, "page_assembly", self._assemble_pages(result, page_plan)
+                )
+                await self._store_result(result, source, is_file, deadline)
             return result # Devolver el resultado ANTES del finally
 
         finally:
+            # El borrado no retiene memoria: liberar el presupuesto antes
+            self._release_bytes(reservation, size_kind, response_observed)
+            if usage_reservation is not None:
+                usage_reservation.release() # No-op si ya se registró el uso real
+            self._remove_page_subset(upload_path, source)
             # Intentar borrar SOLO si se subió un archivo Y se pidió borrarlo
             if file_id_to_delete and delete_after_processing:
-                logger.info("Attempting post-OCR deletion for file ID: %s", file_id_to_delete)
-                try:
-                    await self.delete_file(file_id_to_delete)
-                except Exception as e:
-                    # Loguear el error de borrado pero NO relanzarlo para no ocultar el resultado/error original
-                    logger.warning(
-                        "Failed to delete file %s after OCR processing: %s",
-                        file_id_to_delete, e, exc_info=True # Añadir traceback al log
-                    )
+                await self._cleanup_file(
+                    file_id_to_delete, "OCR", traffic_class, deadline
+                )
 
 
+    async def _ask_with_ocr_text(
+        self,
+        source: str,
+        question: str,
+        model: str,
+        ocr_result: Union[OcrResult, LeanOcrResult, None],
+        max_context_pages: int,
+        delete_after_processing: bool,
+        traffic_class: Optional[str],
+        tag: Optional[str],
+        deadline: Optional[Deadline] = None,
+        lean: bool = False,
+    ) -> Union[ChatCompletionResult, LeanChatCompletionResult]:
+        """Answers ``question`` from the text of the most relevant OCR pages."""
+        if ocr_result is None:
+            logger.info("OCRing source on demand for text-mode Ask: %s", source)
+            # El OCR previo y la pregunta comparten el mismo presupuesto
+            ocr_result = await self.ocr(
+                source, include_image_base64=False,
+                delete_after_processing=delete_after_processing,
+                traffic_class=traffic_class, tag=tag, timeout_budget=deadline,
+                lean=True, # Solo se necesita el texto de las páginas
+            )
+        pages = select_relevant_pages(question, ocr_result.pages, max_context_pages)
+        logger.info(
+            "Sending text-mode Ask with pages %s of %d",
+            [page.index for page in pages], len(ocr_result.pages)
+        )
+        message_content = [{"type": "text", "text": question}] + [
+            {"type": "text", "text": f"[Page {page.index + 1}]\n{page.markdown}"}
+            for page in pages
+        ]
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": message_content}],
+        }
+
+        usage_reservation, reservation, _ = await self._run_phase(
+            deadline, "admission", self._admit(CHAT, tag, None, "chat")
+        )
+        response_observed = False
+        result_model = LeanChatCompletionResult if lean else ChatCompletionResult
+        try:
+            result = await self._request(
+                "POST", "/chat/completions", response_model=result_model,
+                traffic_class=traffic_class, reservation=reservation,
+                deadline=deadline, phase="chat", json=payload
+            )
+            response_observed = True
+            if not isinstance(result, result_model):
+                 raise PiscoMistralOcrError(
+                     "Ask request did not return a valid ChatCompletionResult: "
+                     f"{result}"
+                 )
+            self.usage.record_chat(result, tag, usage_reservation)
+            return result
+        finally:
+            self._release_bytes(reservation, "chat", response_observed)
+            usage_reservation.release()
+
     # MODIFICADO: Añadir delete_after_processing y bloque finally
     async def ask(
         self,
@@ -288,20 +932,56 @@ class PiscoMistralOcrClient:
         doc_image_limit: int = 8,
         doc_page_limit: int = 64,
         delete_after_processing: bool = False, # Nuevo parámetro
-    ) -> ChatCompletionResult:
-        """ Asks a question... (docstring sin cambios excepto añadir el nuevo parámetro) """
+        traffic_class: Optional[str] = None,
+        tag: Optional[str] = None,
+        ocr_result: Union[OcrResult, LeanOcrResult, None] = None,
+        use_ocr_text: bool = False,
+        max_context_pages: int = 8,
+        timeout_budget: Union[float, Deadline, None] = None,
+        lean: bool = False,
+    ) -> Union[ChatCompletionResult, LeanChatCompletionResult]:
+        """ Asks a question... (docstring sin cambios excepto añadir el nuevo parámetro)
+
+        Text mode: when ``ocr_result`` is given (or ``use_ocr_text=True``, which
+        OCRs ``source`` first), only the ``max_context_pages`` pages most relevant
+        to the question, ranked locally with BM25 over ``OcrPage.markdown``, are
+        sent as text parts. The document is not re-uploaded and
+        ``doc_page_limit`` does not apply.
+
+        ``timeout_budget`` works as in :meth:`ocr`; in text mode the on-demand
+        OCR and the chat request share it. ``lean=True`` returns a
+        :class:`LeanChatCompletionResult` (see :meth:`ocr`).
+        """
         model = model or self.default_chat_model
+        deadline = Deadline.coerce(timeout_budget)
+        if ocr_result is not None or use_ocr_text:
+            return await self._ask_with_ocr_text(
+                source, question, model, ocr_result, max_context_pages,
+                delete_after_processing, traffic_class, tag, deadline, lean
+            )
         doc_url: str
         file_id_to_delete: Optional[str] = None # Para guardar el ID
+        reservation: Optional[ByteReservation] = None
+        usage_reservation: Optional[UsageReservation] = None
+        response_observed = False
 
         try:
             is_likely_url = source.startswith(("http://", "https://"))
             is_file = not is_likely_url and os.path.exists(source)
+            if is_file or is_likely_url:
+                usage_reservation, reservation, expected_bytes = await self._run_phase(
+                    deadline, "admission",
+                    self._admit(CHAT, tag, source if is_file else None, "chat"),
+                )
 
             if is_file:
                  logger.info("Processing local file for Ask: %s", source)
                  # Obtener URL firmada Y file_id
-                 doc_url, file_id_to_delete = await self._handle_file_upload(source)
+                 doc_url, file_id_to_delete = await self._handle_file_upload(
+                     source, traffic_class=traffic_class, deadline=deadline
+                 )
+                 if reservation is not None:
+                     reservation.resize(expected_bytes)
             elif is_likely_url:
                  logger.info("Processing URL for Ask: %s", source)
                  doc_url = source
@@ -323,20 +1003,29 @@ class PiscoMistralOcrClient:
             }
 
             logger.info("Sending Ask request for source: %s", source)
-            result = await self._request("POST", "/chat/completions", response_model=ChatCompletionResult, json=payload)
-            if not isinstance(result, ChatCompletionResult):
-                 raise PiscoMistralOcrError(f"Ask request did not return a valid ChatCompletionResult: {result}")
+            result_model = LeanChatCompletionResult if lean else ChatCompletionResult
+            result = await self._request(
+                "POST", "/chat/completions", response_model=result_model,
+                traffic_class=traffic_class, reservation=reservation,
+                deadline=deadline, phase="chat", json=payload
+            )
+            response_observed = True
+            if not isinstance(result, result_model):
+                 raise PiscoMistralOcrError(
+                     "Ask request did not return a valid ChatCompletionResult: "
+                     f"{result}"
+                 )
+            self.usage.record_chat(result, tag, usage_reservation)
             logger.info("Ask request successful for source: %s", source)
             return result # Devolver el resultado ANTES del finally
 
         finally:
+            # El borrado no retiene memoria: liberar el presupuesto antes
+            self._release_bytes(reservation, "chat", response_observed)
+            if usage_reservation is not None:
+                usage_reservation.release()
              # Intentar borrar SOLO si se subió un archivo Y se pidió borrarlo
             if file_id_to_delete and delete_after_processing:
-                logger.info("Attempting post-Ask deletion for file ID: %s", file_id_to_delete)
-                try:
-                    await self.delete_file(file_id_to_delete)
-                except Exception as e:
-                    logger.warning(
-                        "Failed to delete file %s after Ask processing: %s",
-                        file_id_to_delete, e, exc_info=True
-                    )
+                await self._cleanup_file(
+                    file_id_to_delete, "Ask", traffic_class, deadline
+                )
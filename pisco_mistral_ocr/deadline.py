@@ -0,0 +1,64 @@
+# pisco_mistral_ocr/deadline.py
+"""
+Presupuesto de tiempo de extremo a extremo para llamadas de varios pasos.
+"""
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar, Union
+
+from .exceptions import DeadlineExceededError
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """
+    A time budget shared by every step of a call (admission, upload,
+    signed-URL fetch, OCR/chat request, hedged duplicates). Each step only gets
+    the time left, and running out raises :class:`DeadlineExceededError`
+    naming the phase that was in progress.
+
+    Args:
+        timeout_budget: Total seconds available from now.
+    """
+
+    def __init__(self, timeout_budget: float):
+        if timeout_budget <= 0:
+            raise ValueError("timeout_budget must be positive.")
+        self.timeout_budget = timeout_budget
+        self.expires_at = time.monotonic() + timeout_budget
+
+    @classmethod
+    def coerce(cls, value: Union[float, "Deadline", None]) -> Optional["Deadline"]:
+        """
+        Accepts seconds or an existing Deadline (to share one budget across
+        calls).
+        """
+        if value is None or isinstance(value, Deadline):
+            return value
+        return cls(float(value))
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def check(self, phase: str) -> None:
+        if self.remaining() <= 0:
+            raise DeadlineExceededError(phase, self.timeout_budget)
+
+    async def run(self, phase: str, awaitable: Awaitable[T]) -> T:
+        """Awaits ``awaitable`` for at most the remaining budget."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close() # Evitar el aviso de "coroutine was never awaited"
+            raise DeadlineExceededError(phase, self.timeout_budget)
+        try:
+            return await asyncio.wait_for(awaitable, timeout=remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(phase, self.timeout_budget) from None
+
+    def __repr__(self) -> str:
+        return (
+            f"Deadline(timeout_budget={self.timeout_budget}, "
+            f"remaining={self.remaining():.3f})"
+        )
@@ -22,5 +22,35 @@ class NetworkError(PiscoMistralOcrError):
     pass
 
 class FileError(PiscoMistralOcrError):
-    """Error relacionado con el manejo de archivos locales (ej., archivo no encontrado)."""
+    """Error al manejar archivos locales (ej., archivo no encontrado)."""
     pass
+
+class CircuitOpenError(PiscoMistralOcrError):
+    """Se lanza sin llamar a la API cuando el circuito de un endpoint está abierto."""
+    def __init__(self, endpoint: str, retry_after: float):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__(
+            f"Circuit open for {endpoint}; failing fast (retry in {retry_after:.1f}s)."
+        )
+
+class BudgetExceededError(PiscoMistralOcrError):
+    """Se lanza antes de llamar a la API cuando un presupuesto de uso está agotado."""
+    def __init__(self, budget: str, retry_after: float):
+        self.budget = budget
+        self.retry_after = retry_after
+        super().__init__(
+            f"Usage budget exhausted: {budget} (frees up in {retry_after:.1f}s)."
+        )
+
+class DeadlineExceededError(PiscoMistralOcrError):
+    """
+    Se lanza cuando se agota el presupuesto de tiempo de una llamada; indica en
+    qué fase.
+    """
+    def __init__(self, phase: str, timeout_budget: float):
+        self.phase = phase
+        self.timeout_budget = timeout_budget
+        super().__init__(
+            f"Deadline of {timeout_budget:.2f}s exceeded during the '{phase}' phase."
+        )
@@ -0,0 +1,265 @@
+# pisco_mistral_ocr/lean.py
+"""
+Resultados ligeros (``__slots__`` y tuplas) para mantener muchas páginas en memoria.
+
+Se construyen directamente desde el JSON de la API, validando solo que estén
+los campos obligatorios, y se convierten a los modelos pydantic con
+``to_model()`` cuando hace falta. Exponen los mismos atributos que
+``OcrResult``/``OcrPage``/``ChatCompletionResult``, así que el resto de la
+librería (uso, almacén, ranking, caché de páginas) los acepta sin cambios.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from .models import ChatCompletionResult, OcrPage, OcrResult
+
+
+def _invalid(data: Any, fields: tuple, name: str) -> ValueError:
+    # Solo se llama cuando falla el acceso directo: el camino normal no valida nada más
+    if not isinstance(data, dict):
+        return ValueError(f"{name} expects a JSON object, got {type(data).__name__}.")
+    missing = [field for field in fields if field not in data]
+    return ValueError(f"{name} is missing required fields: {', '.join(missing)}.")
+
+
+def _extra(data: Dict[str, Any], known: frozenset) -> Optional[Dict[str, Any]]:
+    # Los campos desconocidos solo ocupan memoria si existen
+    if known.issuperset(data):
+        return None
+    return {key: value for key, value in data.items() if key not in known}
+
+
+class LeanOcrUsageInfo(NamedTuple):
+    pages_processed: int
+    doc_size_bytes: Optional[int] = None
+
+
+class LeanUsageInfo(NamedTuple):
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+
+class LeanChatMessage(NamedTuple):
+    role: str
+    content: Any # str o lista de partes tal como llegan
+
+
+class LeanChatChoice(NamedTuple):
+    index: int
+    message: LeanChatMessage
+    finish_reason: Optional[str] = None
+
+
+class _LeanResult(ABC):
+    """Common helpers: attribute equality, repr and conversion to the pydantic model."""
+
+    __slots__ = ()
+    _model: Any = None
+
+    @abstractmethod
+    def model_dump(self, by_alias: bool = False) -> Dict[str, Any]:
+        """Returns the same dict as the pydantic model's ``model_dump()``."""
+
+    def to_model(self) -> Any:
+        """Returns the equivalent (fully validated) pydantic model."""
+        return self._model.model_validate(self.model_dump())
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    __hash__ = None # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self.__slots__
+            if name != "extra"
+        )
+        return f"{type(self).__name__}({fields})"
+
+
+class LeanOcrPage(_LeanResult):
+    """Lightweight equivalent of :class:`OcrPage`."""
+
+    __slots__ = ("index", "markdown", "images", "dimensions", "extra")
+    _model = OcrPage
+    # Un campo de la API llamado "extra" no es conocido: va a parar a extra
+    _fields = frozenset(__slots__) - {"extra"}
+
+    def __init__(
+        self,
+        index: int,
+        markdown: str,
+        images: Optional[List[Any]] = None,
+        dimensions: Optional[Dict[str, Any]] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ):
+        self.index = index
+        self.markdown = markdown
+        self.images = images
+        self.dimensions = dimensions
+        self.extra = extra
+
+    @classmethod
+    def model_validate(cls, data: Dict[str, Any]) -> "LeanOcrPage":
+        try:
+            return cls(
+                data["index"], data["markdown"],
+                data.get("images"), data.get("dimensions"),
+                _extra(data, cls._fields),
+            )
+        except (KeyError, TypeError, AttributeError):
+            raise _invalid(data, ("index", "markdown"), cls.__name__) from None
+
+    def model_dump(self, by_alias: bool = False) -> Dict[str, Any]:
+        data = {
+            "index": self.index, "markdown": self.markdown,
+            "images": self.images, "dimensions": self.dimensions,
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class LeanOcrResult(_LeanResult):
+    """
+    Lightweight equivalent of :class:`OcrResult`; ``pages`` holds
+    :class:`LeanOcrPage`.
+    """
+
+    __slots__ = ("id", "object", "model", "pages", "usage_info", "extra")
+    _model = OcrResult
+    _fields = frozenset(__slots__) - {"extra"}
+
+    def __init__(
+        self,
+        model: str,
+        pages: List[LeanOcrPage],
+        id: Optional[str] = None,
+        object: Optional[str] = "ocr.ocr_result",
+        usage_info: Optional[LeanOcrUsageInfo] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ):
+        self.id = id
+        self.object = object
+        self.model = model
+        self.pages = pages
+        self.usage_info = usage_info
+        self.extra = extra
+
+    @classmethod
+    def model_validate(cls, data: Dict[str, Any]) -> "LeanOcrResult":
+        try:
+            model, raw_pages = data["model"], data["pages"]
+        except (KeyError, TypeError):
+            raise _invalid(data, ("model", "pages"), cls.__name__) from None
+        usage = data.get("usage_info")
+        if usage is not None:
+            try:
+                usage = LeanOcrUsageInfo(
+                    usage["pages_processed"], usage.get("doc_size_bytes")
+                )
+            except (KeyError, TypeError, AttributeError):
+                raise _invalid(
+                    usage, ("pages_processed",), "LeanOcrUsageInfo"
+                ) from None
+        page = LeanOcrPage.model_validate
+        return cls(
+            model, [page(raw) for raw in raw_pages], data.get("id"),
+            data.get("object", "ocr.ocr_result"), usage, _extra(data, cls._fields),
+        )
+
+    def model_dump(self, by_alias: bool = False) -> Dict[str, Any]:
+        data = {
+            "id": self.id, "object": self.object, "model": self.model,
+            "pages": [page.model_dump() for page in self.pages],
+            "usage_info": (
+                self.usage_info._asdict() if self.usage_info is not None else None
+            ),
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class LeanChatCompletionResult(_LeanResult):
+    """Lightweight equivalent of :class:`ChatCompletionResult`."""
+
+    __slots__ = ("id", "object", "created", "model", "choices", "usage", "extra")
+    _model = ChatCompletionResult
+    _fields = frozenset(__slots__) - {"extra"}
+
+    def __init__(
+        self,
+        id: str,
+        created: int,
+        model: str,
+        choices: List[LeanChatChoice],
+        usage: LeanUsageInfo,
+        object: str = "chat.completion",
+        extra: Optional[Dict[str, Any]] = None,
+    ):
+        self.id = id
+        self.object = object
+        self.created = created
+        self.model = model
+        self.choices = choices
+        self.usage = usage
+        self.extra = extra
+
+    @classmethod
+    def model_validate(cls, data: Dict[str, Any]) -> "LeanChatCompletionResult":
+        required = ("id", "created", "model", "choices", "usage")
+        try:
+            id, created, model, raw_choices, usage = (data[field] for field in required)
+        except (KeyError, TypeError):
+            raise _invalid(data, required, cls.__name__) from None
+        choices = []
+        for choice in raw_choices:
+            try:
+                message = choice["message"]
+                choices.append(LeanChatChoice(
+                    choice["index"],
+                    LeanChatMessage(message["role"], message["content"]),
+                    choice.get("finish_reason"),
+                ))
+            except (KeyError, TypeError, AttributeError):
+                if isinstance(choice, dict) and {"index", "message"} <= choice.keys():
+                    raise _invalid(
+                        choice["message"], ("role", "content"), "LeanChatMessage"
+                    ) from None
+                raise _invalid(choice, ("index", "message"), "LeanChatChoice") from None
+        try:
+            usage = LeanUsageInfo(
+                usage["prompt_tokens"],
+                usage["completion_tokens"],
+                usage["total_tokens"],
+            )
+        except (KeyError, TypeError):
+            raise _invalid(usage, LeanUsageInfo._fields, "LeanUsageInfo") from None
+        return cls(
+            id, created, model, choices, usage,
+            data.get("object", "chat.completion"), _extra(data, cls._fields),
+        )
+
+    def model_dump(self, by_alias: bool = False) -> Dict[str, Any]:
+        data = {
+            "id": self.id, "object": self.object,
+            "created": self.created, "model": self.model,
+            "choices": [
+                {
+                    "index": c.index, "message": c.message._asdict(),
+                    "finish_reason": c.finish_reason,
+                }
+                for c in self.choices
+            ],
+            "usage": self.usage._asdict(),
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
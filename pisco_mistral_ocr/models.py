@@ -5,6 +5,10 @@ from pydantic import BaseModel, Field, ConfigDict
 class BaseMistralModel(BaseModel):
     model_config = ConfigDict(extra='allow')
 
+class DeferredMistralModel(BaseMistralModel):
+    """Base for rarely used models: validators are built on first use, not at import."""
+    model_config = ConfigDict(extra='allow', defer_build=True)
+
 # --- Modelos OCR ---
 class OcrPage(BaseMistralModel):
     index: int
@@ -24,11 +28,11 @@ class OcrResult(BaseMistralModel):
     usage_info: Optional[OcrUsageInfo] = None
 
 # --- Modelos Chat/Document Understanding ---
-class TextContentPart(BaseMistralModel):
+class TextContentPart(DeferredMistralModel):
     type: str = "text"
     text: str
 
-class DocumentUrlContentPart(BaseMistralModel):
+class DocumentUrlContentPart(DeferredMistralModel):
     type: str = "document_url"
     document_url: str
 
@@ -57,7 +61,7 @@ class ChatCompletionResult(BaseMistralModel):
     usage: UsageInfo
 
 # --- Modelos para el manejo de archivos ---
-class FileUploadResponse(BaseMistralModel):
+class FileUploadResponse(DeferredMistralModel):
     id: str
     object: str = "file"
     size_bytes: int = Field(..., alias='bytes')
@@ -65,11 +69,49 @@ class FileUploadResponse(BaseMistralModel):
     filename: str
     purpose: str
 
-class SignedUrlResponse(BaseMistralModel):
+class SignedUrlResponse(DeferredMistralModel):
     url: str
 
 # NUEVO: Modelo para la respuesta de eliminación de archivo
-class FileDeleteResponse(BaseMistralModel):
+class FileDeleteResponse(DeferredMistralModel):
     id: str
     object: str # Probablemente algo como 'file.deleted'
-    deleted: bool
\ No newline at end of file
+    deleted: bool
+
+# --- Modelos de post-procesado (ver postprocess.py) ---
+class MarkdownTable(DeferredMistralModel):
+    headers: List[str]
+    rows: List[List[str]]
+
+class SectionSpan(DeferredMistralModel):
+    level: int
+    title: str
+    start: int # Offset en caracteres dentro de OcrPage.markdown
+    end: int
+
+class ImageReference(DeferredMistralModel):
+    id: str
+    alt: str = ""
+    image: Optional[Dict[str, Any]] = None # Entrada de OcrPage.images, si existe
+
+class ProcessedPage(DeferredMistralModel):
+    index: int
+    plain_text: str
+    tables: List[MarkdownTable] = []
+    sections: List[SectionSpan] = []
+    images: List[ImageReference] = []
+
+
+# --- Modelos de búsqueda en el almacén de resultados (ver store.py) ---
+class SearchPageHit(DeferredMistralModel):
+    page_index: int
+    snippet: str
+    score: float # bm25: más bajo es más relevante
+
+class SearchHit(DeferredMistralModel):
+    document_id: int
+    source: Optional[str] = None
+    content_hash: str
+    model: str
+    score: float
+    pages: List[SearchPageHit]
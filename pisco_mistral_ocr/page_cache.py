@@ -0,0 +1,291 @@
+# pisco_mistral_ocr/page_cache.py
+"""
+Caché de OCR a nivel de página para PDFs locales.
+
+Cada página se identifica por un hash de su contenido normalizado (stream de
+contenido, tamaño, rotación, imágenes y fuentes), de modo que portadas, términos
+y condiciones o membretes repetidos entre documentos solo se envían a /ocr una vez.
+Requiere la dependencia opcional ``pypdf`` (``pip install pisco-mistral-ocr[pages]``).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from .exceptions import ConfigurationError, FileError
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(rb"\s+")
+
+
+def _require_pypdf() -> Any:
+    try:
+        import pypdf
+    except ImportError:
+        raise ConfigurationError(
+            "Page-level caching requires pypdf: pip install 'pisco-mistral-ocr[pages]'"
+        ) from None
+    return pypdf
+
+
+def _stream_digest(obj: Any) -> bytes:
+    try:
+        data = obj.get_data()
+    except Exception:
+        data = getattr(obj, "_data", b"") or b""
+    return hashlib.sha256(data).digest()
+
+
+def _hash_resources(digest: Any, resources: Any, seen: Set[Any]) -> None:
+    """Hashes fonts and XObjects, recursing into the resources of Form XObjects."""
+    resources = resources.get_object() if resources is not None else {}
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            digest.update(str(name).encode())
+            _hash_stream(digest, xobjects[name], seen)
+    fonts = resources.get("/Font")
+    if fonts is not None:
+        fonts = fonts.get_object()
+        for name in sorted(fonts):
+            digest.update(str(name).encode())
+            digest.update(str(fonts[name].get_object().get("/BaseFont")).encode())
+
+
+def _hash_stream(digest: Any, ref: Any, seen: Set[Any]) -> None:
+    """
+    Hashes a content stream (XObject or appearance) and, for forms, its own
+    resources.
+    """
+    obj = ref.get_object()
+    digest.update(_stream_digest(obj))
+    # Un Form XObject puede compartirse o referenciarse a sí mismo:
+    # visitar cada uno una vez
+    idnum = getattr(ref, "idnum", None)
+    key = ("ref", idnum) if idnum is not None else ("obj", id(obj))
+    if key in seen:
+        return
+    seen.add(key)
+    if obj.get("/Subtype") == "/Form":
+        _hash_resources(digest, obj.get("/Resources"), seen)
+
+
+def _hash_annotations(digest: Any, page: Any, seen: Set[Any]) -> None:
+    # Formularios rellenados y anotaciones (FreeText, sellos) no están en /Contents
+    annots = page.get("/Annots")
+    if annots is None:
+        return
+    for annot in annots.get_object():
+        annot = annot.get_object()
+        digest.update(repr((
+            str(annot.get("/Subtype")),
+            str(annot.get("/Contents", "")),
+            str(annot.get("/V", "")),
+        )).encode())
+        appearance = annot.get("/AP")
+        normal = appearance.get_object().get("/N") if appearance is not None else None
+        if normal is None:
+            continue
+        normal_obj = normal.get_object()
+        if hasattr(normal_obj, "get_data"):
+            _hash_stream(digest, normal, seen)
+        else: # Diccionario de estados (casillas de verificación, botones de opción)
+            state = str(annot.get("/AS", ""))
+            digest.update(state.encode())
+            if state in normal_obj:
+                _hash_stream(digest, normal_obj[state], seen)
+
+
+def _page_fingerprint(page: Any) -> str:
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    data = contents.get_data() if contents is not None else b""
+    # Normalizar espacios: distintos generadores serializan el mismo contenido distinto
+    digest.update(_WHITESPACE_RE.sub(b" ", data).strip())
+    box = page.mediabox
+    digest.update(repr((
+        round(float(box.width), 2),
+        round(float(box.height), 2),
+        int(page.get("/Rotate", 0) or 0),
+    )).encode())
+    seen: Set[Any] = set()
+    _hash_resources(digest, page.get("/Resources"), seen)
+    _hash_annotations(digest, page, seen)
+    return digest.hexdigest()
+
+
+def page_fingerprints(file_path: str) -> List[str]:
+    """Returns a content hash per page of a local PDF, in page order."""
+    pypdf = _require_pypdf()
+    try:
+        reader = pypdf.PdfReader(file_path)
+        return [_page_fingerprint(page) for page in reader.pages]
+    except OSError as e:
+        raise FileError(f"Could not read file {file_path}: {e}") from e
+
+
+def write_page_subset(file_path: str, indices: Sequence[int]) -> str:
+    """
+    Writes the pages ``indices`` of ``file_path`` into a new temporary PDF and
+    returns its path. The caller must delete it.
+    """
+    pypdf = _require_pypdf()
+    reader = pypdf.PdfReader(file_path)
+    writer = pypdf.PdfWriter()
+    for index in indices:
+        writer.add_page(reader.pages[index])
+    fd, subset_path = tempfile.mkstemp(
+        prefix=os.path.splitext(os.path.basename(file_path))[0] + "-", suffix=".pdf"
+    )
+    with os.fdopen(fd, "wb") as f:
+        writer.write(f)
+    return subset_path
+
+
+class PageCache:
+    """
+    LRU cache of OCR pages keyed by model, image mode and page fingerprint.
+
+    The in-memory LRU is bounded both by entries and by bytes (the JSON size of
+    each page, base64 images included). Evicted pages stay on disk when a
+    ``directory`` is set. Lookups and writes may block on disk, so the client
+    calls them from an executor; the cache is safe to share between threads.
+
+    Args:
+        directory: Optional directory where entries are also persisted as JSON,
+            so the cache survives restarts and can be shared between processes.
+        max_entries: Maximum number of pages kept in memory.
+        max_bytes: Maximum total size of the pages kept in memory.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_entries: int = 10000,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        # Clave -> (página, tamaño en bytes de su JSON)
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(model: str, include_image_base64: bool, fingerprint: str) -> str:
+        return f"{model}:{int(include_image_base64)}:{fingerprint}"
+
+    def _path(self, key: str) -> str:
+        assert self.directory is not None
+        name = hashlib.sha256(key.encode()).hexdigest() + ".json"
+        return os.path.join(self.directory, name)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached page data (without its index) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        page = None
+        if self.directory is not None:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    data = f.read()
+                page = json.loads(data)
+            except (OSError, ValueError):
+                page = None
+        with self._lock:
+            if page is None:
+                self.misses += 1
+                return None
+            self._remember(key, page, len(data))
+            self.hits += 1
+        return page
+
+    def put(self, key: str, page: Dict[str, Any]) -> None:
+        page = {name: value for name, value in page.items() if name != "index"}
+        data = json.dumps(page)
+        with self._lock:
+            self._remember(key, page, len(data))
+        if self.directory is not None:
+            try:
+                with open(self._path(key), "w", encoding="utf-8") as f:
+                    f.write(data)
+            except OSError as e:
+                logger.warning("Could not persist cached page %s: %s", key, e)
+
+    def _remember(self, key: str, page: Dict[str, Any], size: int) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.nbytes -= previous[1]
+        self._entries[key] = (page, size)
+        self.nbytes += size
+        # Una página mayor que todo el presupuesto no se queda en memoria (sí en disco)
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.nbytes > self.max_bytes
+        ):
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PagePlan:
+    """Which pages of a PDF are served from the cache and which must be OCR'd."""
+
+    def __init__(
+        self,
+        cache: PageCache,
+        model: str,
+        include_image_base64: bool,
+        fingerprints: List[str],
+    ):
+        self.cache = cache
+        self.keys = [
+            PageCache.key(model, include_image_base64, fp) for fp in fingerprints
+        ]
+        self.cached: Dict[int, Dict[str, Any]] = {}
+        # Primera aparición de cada página no cacheada
+        # (las repetidas en el mismo PDF se envían una vez)
+        self.missing: List[int] = []
+        seen: Dict[str, int] = {}
+        for index, key in enumerate(self.keys):
+            page = cache.get(key) if key not in seen else None
+            if page is not None:
+                self.cached[index] = page
+            elif key not in seen:
+                seen[key] = index
+                self.missing.append(index)
+
+    def assemble(self, ocr_pages: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merges freshly OCR'd pages (in ``missing`` order) with the cached ones,
+        stores the new pages in the cache and returns every page in original order.
+        """
+        if len(ocr_pages) != len(self.missing):
+            raise ValueError(
+                f"Expected {len(self.missing)} OCR pages for the page subset, "
+                f"got {len(ocr_pages)}."
+            )
+        by_key: Dict[str, Dict[str, Any]] = {}
+        for index, page in zip(self.missing, ocr_pages):
+            self.cache.put(self.keys[index], page)
+            by_key[self.keys[index]] = page
+        for index, page in self.cached.items():
+            by_key.setdefault(self.keys[index], page)
+        return [dict(by_key[key], index=index) for index, key in enumerate(self.keys)]
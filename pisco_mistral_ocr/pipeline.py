@@ -0,0 +1,373 @@
+# pisco_mistral_ocr/pipeline.py
+"""
+Ejecutor en etapas (subida → URL firmada → OCR → borrado → post-procesado
+opcional) para lotes de documentos.
+
+Cada etapa tiene su propia cola acotada y su propio número de workers, de modo
+que el documento N+1 se sube mientras el documento N está en OCR, y una etapa
+lenta frena a las anteriores (backpressure) en vez de acumular trabajo en memoria.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import (
+    TYPE_CHECKING, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+)
+
+from .admission import ByteReservation
+from .lean import LeanOcrResult
+from .page_cache import PagePlan
+from .models import OcrResult, ProcessedPage
+from .usage import OCR, UsageReservation
+
+if TYPE_CHECKING:
+    from .client import PiscoMistralOcrClient
+    from .postprocess import PostProcessor
+
+logger = logging.getLogger(__name__)
+
+UPLOAD = "upload"
+SIGN = "sign"
+OCR_STAGE = "ocr"
+DELETE = "delete"
+POSTPROCESS = "postprocess"
+STAGES = (UPLOAD, SIGN, OCR_STAGE, DELETE)
+
+
+class StageStats:
+    """Throughput and utilisation counters for one pipeline stage."""
+
+    __slots__ = (
+        "concurrency", "processed", "failed", "skipped", "busy_time", "queue_wait"
+    )
+
+    def __init__(self, concurrency: int) -> None:
+        self.concurrency = concurrency
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0 # Documentos que llegaron con un error de una etapa anterior
+        self.busy_time = 0.0
+        self.queue_wait = 0.0
+
+    def as_dict(self, elapsed: float) -> Dict[str, float]:
+        capacity = elapsed * self.concurrency
+        dequeued = self.processed + self.skipped
+        return {
+            "concurrency": self.concurrency,
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "busy_time": self.busy_time,
+            "avg_queue_wait": self.queue_wait / dequeued if dequeued else 0.0,
+            # Fracción del tiempo en que los workers de la etapa estuvieron ocupados
+            "utilisation": self.busy_time / capacity if capacity > 0 else 0.0,
+        }
+
+
+class _Job:
+    __slots__ = (
+        "position", "source", "is_file", "file_id", "doc_type", "doc_value",
+        "page_plan", "upload_path", "reservation", "usage_reservation",
+        "expected_bytes", "result", "processed", "error", "enqueued_at",
+    )
+
+    def __init__(self, position: int, source: str):
+        self.position = position
+        self.source = source
+        self.is_file = False
+        self.file_id: Optional[str] = None
+        self.doc_type = "document_url"
+        self.doc_value = source
+        self.page_plan: Optional[PagePlan] = None
+        self.upload_path = source # PDF con solo las páginas no cacheadas, si aplica
+        self.reservation: Optional[ByteReservation] = None
+        self.usage_reservation: Optional[UsageReservation] = None
+        self.expected_bytes = 0
+        self.result: Union[OcrResult, LeanOcrResult, None] = None
+        self.processed: Union[List[ProcessedPage], BaseException, None] = None
+        self.error: Optional[BaseException] = None
+        self.enqueued_at = 0.0
+
+
+class OcrPipeline:
+    """
+    Pipelined OCR over many sources with a queue and concurrency limit per stage.
+
+    The client's scheduler, byte budget, usage budgets, circuit breakers,
+    page cache and result store all still apply. Errors are captured per
+    document, as with ``asyncio.gather(..., return_exceptions=True)``.
+
+    Args:
+        client: The client used for every request.
+        upload_concurrency: Parallel uploads (bounded by your uplink).
+        sign_concurrency: Parallel signed-URL requests.
+        ocr_concurrency: Parallel /ocr requests (bounded by API concurrency).
+        delete_concurrency: Parallel deletions.
+        post_processor: Optional :class:`PostProcessor`. Adds a last stage
+            that parses each OCR result while later documents are still being
+            uploaded or OCR'd; see :meth:`processed`.
+        postprocess_concurrency: Documents handed to the post-processor at
+            once (each one is split into page batches across its pool).
+        queue_size: Capacity of the queue in front of each stage.
+        model, include_image_base64, delete_after_processing, traffic_class, tag, lean:
+            Same meaning as in :meth:`PiscoMistralOcrClient.ocr`.
+    """
+
+    def __init__(
+        self,
+        client: "PiscoMistralOcrClient",
+        upload_concurrency: int = 2,
+        sign_concurrency: int = 4,
+        ocr_concurrency: int = 4,
+        delete_concurrency: int = 2,
+        post_processor: Optional["PostProcessor"] = None,
+        postprocess_concurrency: int = 2,
+        queue_size: int = 8,
+        model: Optional[str] = None,
+        include_image_base64: bool = True,
+        delete_after_processing: bool = True,
+        traffic_class: Optional[str] = None,
+        tag: Optional[str] = None,
+        lean: bool = False,
+    ):
+        concurrency = {
+            UPLOAD: upload_concurrency, SIGN: sign_concurrency,
+            OCR_STAGE: ocr_concurrency, DELETE: delete_concurrency,
+            POSTPROCESS: postprocess_concurrency,
+        }
+        if min(concurrency.values()) < 1 or queue_size < 1:
+            raise ValueError("Stage concurrency and queue_size must be at least 1.")
+        self.client = client
+        self.concurrency = concurrency
+        self.post_processor = post_processor
+        # El post-procesado va después del borrado: parsear no retrasa borrar el archivo
+        self.stages = STAGES + (POSTPROCESS,) if post_processor is not None else STAGES
+        self.queue_size = queue_size
+        self.model = model or client.default_ocr_model
+        self.include_image_base64 = include_image_base64
+        self.delete_after_processing = delete_after_processing
+        self.traffic_class = traffic_class
+        self.tag = tag
+        self.lean = lean
+        self._size_kind = "ocr_images" if include_image_base64 else "ocr_text"
+        self._stats: Dict[str, StageStats] = {}
+        self._jobs: List[_Job] = []
+        self._elapsed = 0.0
+        self._started_at: Optional[float] = None
+
+    # --- Etapas ---
+    async def _upload(self, job: _Job) -> bool:
+        is_url = job.source.startswith(("http://", "https://"))
+        job.is_file = not is_url and os.path.exists(job.source)
+        if not (job.is_file or is_url):
+            raise ValueError(
+                f"Source '{job.source}' is not recognized as a valid URL "
+                "or an existing local file path."
+            )
+        is_pdf = job.source.lower().endswith(".pdf")
+        if job.is_file and self.client.page_cache is not None and is_pdf:
+            job.page_plan, job.upload_path = await self.client._plan_pages(
+                job.source, self.model, self.include_image_base64
+            )
+            if job.page_plan is not None and not job.page_plan.missing:
+                # Todas las páginas están en caché: las etapas siguientes no hacen nada
+                job.result = self.client._cached_result(
+                    job.page_plan, self.model, self.lean
+                )
+                await self.client._store_result(job.result, job.source, True)
+                return True
+        # La admisión (presupuestos de uso y de bytes) ocurre al entrar al pipeline
+        admission = await self.client._admit(
+            OCR, self.tag, job.upload_path if job.is_file else None, self._size_kind,
+            len(job.page_plan.missing) if job.page_plan is not None else None,
+        )
+        job.usage_reservation, job.reservation, job.expected_bytes = admission
+        if not job.is_file:
+            job.doc_type = self.client._url_document_type(job.source)
+            return False
+        job.file_id = await self.client._upload_file(
+            job.upload_path, traffic_class=self.traffic_class
+        )
+        if job.reservation is not None:
+            job.reservation.resize(job.expected_bytes)
+        return True
+
+    async def _sign(self, job: _Job) -> bool:
+        if job.file_id is None:
+            return False
+        job.doc_value = await self.client._get_signed_url(
+            job.file_id, traffic_class=self.traffic_class
+        )
+        return True
+
+    async def _ocr(self, job: _Job) -> bool:
+        if job.result is not None: # Servido desde la caché de páginas
+            return False
+        observed = False
+        try:
+            job.result = await self.client._run_ocr_request(
+                job.source, job.is_file, job.doc_type, job.doc_value, self.model,
+                self.include_image_base64,
+                traffic_class=self.traffic_class, tag=self.tag,
+                reservation=job.reservation, store_result=job.page_plan is None,
+                lean=self.lean, usage_reservation=job.usage_reservation,
+            )
+            observed = True
+        finally:
+            self.client._release_bytes(job.reservation, self._size_kind, observed)
+        if job.page_plan is not None:
+            job.result = await self.client._assemble_pages(job.result, job.page_plan)
+            await self.client._store_result(job.result, job.source, True)
+        return True
+
+    async def _delete(self, job: _Job) -> bool:
+        # Los fallos anteriores también pasan por aquí para no dejar archivos huérfanos
+        if job.reservation is not None:
+            job.reservation.release()
+        if job.usage_reservation is not None:
+            job.usage_reservation.release()
+        self.client._remove_page_subset(job.upload_path, job.source)
+        if job.file_id is None or not self.delete_after_processing:
+            return False
+        try:
+            await self.client.delete_file(job.file_id, traffic_class=self.traffic_class)
+        except Exception as e:
+            logger.warning(
+                "Failed to delete file %s after OCR processing: %s",
+                job.file_id, e, exc_info=True,
+            )
+        return True
+
+    async def _postprocess(self, job: _Job) -> bool:
+        assert self.post_processor is not None and job.result is not None
+        try:
+            job.processed = await self.post_processor.process(job.result)
+        except Exception as e:
+            # El OCR ya se pagó: un fallo del parseo no reemplaza al resultado
+            logger.warning(
+                "Post-processing failed for %s: %s", job.source, e, exc_info=True
+            )
+            job.processed = e
+            self._stats[POSTPROCESS].failed += 1
+        return True
+
+    # --- Orquestación ---
+    async def _run_stage(
+        self,
+        name: str,
+        handler: Callable[[_Job], Awaitable[bool]],
+        inbox: "asyncio.Queue[Optional[_Job]]",
+        outbox: "Optional[asyncio.Queue[Optional[_Job]]]",
+        downstream_workers: int,
+    ) -> None:
+        stats = self._stats[name]
+        skip_on_error = name != DELETE
+
+        async def worker() -> None:
+            while True:
+                job = await inbox.get()
+                if job is None:
+                    return
+                stats.queue_wait += time.monotonic() - job.enqueued_at
+                if job.error is not None and skip_on_error:
+                    stats.skipped += 1
+                else:
+                    started = time.monotonic()
+                    try:
+                        if await handler(job):
+                            stats.busy_time += time.monotonic() - started
+                    except Exception as e:
+                        stats.busy_time += time.monotonic() - started
+                        stats.failed += 1
+                        job.error = e
+                    stats.processed += 1
+                if outbox is not None:
+                    job.enqueued_at = time.monotonic()
+                    await outbox.put(job) # Bloquea si la etapa siguiente va atrasada
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency[name])))
+        if outbox is not None:
+            for _ in range(downstream_workers):
+                await outbox.put(None)
+
+    async def run(
+        self, sources: Iterable[str]
+    ) -> List[Union[OcrResult, LeanOcrResult, BaseException]]:
+        """
+        Processes every source and returns, in input order, its OcrResult or
+        the exception that stopped it.
+        """
+        stages = self.stages
+        self._stats = {name: StageStats(self.concurrency[name]) for name in stages}
+        self._started_at = time.monotonic()
+        queues: Dict[str, "asyncio.Queue[Optional[_Job]]"] = {
+            name: asyncio.Queue(maxsize=self.queue_size) for name in stages
+        }
+        handlers = {
+            UPLOAD: self._upload, SIGN: self._sign, OCR_STAGE: self._ocr,
+            DELETE: self._delete, POSTPROCESS: self._postprocess,
+        }
+        jobs: List[_Job] = []
+        self._jobs = jobs
+
+        async def feed() -> None:
+            for position, source in enumerate(sources):
+                job = _Job(position, source)
+                jobs.append(job)
+                job.enqueued_at = time.monotonic()
+                await queues[UPLOAD].put(job)
+            for _ in range(self.concurrency[UPLOAD]):
+                await queues[UPLOAD].put(None)
+
+        tasks = [asyncio.ensure_future(feed())]
+        for pos, name in enumerate(stages):
+            next_name = stages[pos + 1] if pos + 1 < len(stages) else None
+            tasks.append(asyncio.ensure_future(self._run_stage(
+                name, handlers[name], queues[name],
+                queues[next_name] if next_name else None,
+                self.concurrency[next_name] if next_name else 0,
+            )))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Si falló el iterable de entrada (o nos cancelaron), los workers
+            # seguirían bloqueados en su cola: cancelarlos y esperar a que terminen
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._elapsed = time.monotonic() - self._started_at
+            self._started_at = None
+            for job in jobs: # Si se canceló a medias, no dejar bytes ni uso reservados
+                if job.reservation is not None:
+                    job.reservation.release()
+                if job.usage_reservation is not None:
+                    job.usage_reservation.release()
+                if os.path.exists(job.upload_path):
+                    self.client._remove_page_subset(job.upload_path, job.source)
+
+        logger.info(
+            "Pipeline processed %d documents in %.2fs", len(jobs), self._elapsed
+        )
+        return [job.error if job.error is not None else job.result for job in jobs]
+
+    def processed(self) -> List[Union[List[ProcessedPage], BaseException, None]]:
+        """
+        Post-processed pages of the last :meth:`run`, in input order: the
+        ProcessedPage list, the exception raised while parsing, or None for
+        documents whose OCR failed (or when there is no post-processor).
+        """
+        return [job.processed for job in self._jobs]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-stage metrics: processed, failed, skipped (documents that reached
+        the stage already failed), busy_time, avg_queue_wait and utilisation
+        (busy time / (elapsed time x stage concurrency)).
+        """
+        if self._started_at is not None:
+            elapsed = time.monotonic() - self._started_at
+        else:
+            elapsed = self._elapsed
+        return {name: stats.as_dict(elapsed) for name, stats in self._stats.items()}
@@ -0,0 +1,275 @@
+# pisco_mistral_ocr/postprocess.py
+"""
+Post-procesado del markdown de OCR: tablas, texto plano, secciones e imágenes.
+
+El parseo es CPU puro, así que :class:`PostProcessor` lo ejecuta en un pool de
+procesos por lotes de páginas, dejando libre el event loop para las llamadas de red.
+"""
+import asyncio
+import logging
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from types import TracebackType
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from .models import (
+    ImageReference, MarkdownTable, OcrPage, OcrResult, ProcessedPage, SectionSpan
+)
+
+logger = logging.getLogger(__name__)
+
+_HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+_TABLE_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\(([^)\s]+)[^)]*\)")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+# Solo delimitadores pegados al texto y no dentro de palabras
+# (snake_case, emails, "2 * 3")
+_EMPHASIS_RE = re.compile(r"(?<!\w)(\*\*|__|~~|\*|_|`)(?=\S)(.+?)(?<=\S)\1(?!\w)")
+_FENCE_RE = re.compile(r"^[ ]{0,3}(`{3,}|~{3,})")
+_LIST_MARKER_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+
+# (índice, markdown) — lo mínimo que viaja al proceso hijo
+PageJob = Tuple[int, str]
+
+
+_TEXT, _FENCE, _CODE = 0, 1, 2
+
+
+def _code_lines(lines: Sequence[str]) -> List[int]:
+    """Classifies each line as text, a code fence, or content of a fenced code block."""
+    kinds: List[int] = []
+    fence: Optional[str] = None
+    for line in lines:
+        match = _FENCE_RE.match(line)
+        if fence is None:
+            if match:
+                fence = match.group(1)
+            kinds.append(_FENCE if match else _TEXT)
+        # Se cierra con el mismo carácter, al menos la misma longitud y sin info string
+        elif (
+            match
+            and match.group(1)[0] == fence[0]
+            and len(match.group(1)) >= len(fence)
+            and not line.strip().lstrip(fence[0])
+        ):
+            fence = None
+            kinds.append(_FENCE)
+        else:
+            kinds.append(_CODE)
+    return kinds
+
+
+def _split_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    cells = re.split(r"(?<!\\)\|", line)
+    return [cell.strip().replace("\\|", "|") for cell in cells]
+
+
+def parse_tables(markdown: str) -> List[MarkdownTable]:
+    """Extracts pipe tables (header row + ``---`` separator + body rows)."""
+    tables: List[MarkdownTable] = []
+    lines = markdown.splitlines()
+    in_code = _code_lines(lines)
+    i = 0
+    while i < len(lines) - 1:
+        is_header = not in_code[i] and "|" in lines[i]
+        if is_header and _TABLE_SEPARATOR_RE.match(lines[i + 1].strip()):
+            headers = _split_row(lines[i])
+            rows: List[List[str]] = []
+            i += 2
+            while (
+                i < len(lines)
+                and not in_code[i]
+                and "|" in lines[i]
+                and lines[i].strip()
+            ):
+                row = _split_row(lines[i])
+                # Normalizar al número de columnas de la cabecera
+                row = (row + [""] * len(headers))[: len(headers)]
+                rows.append(row)
+                i += 1
+            tables.append(MarkdownTable(headers=headers, rows=rows))
+        else:
+            i += 1
+    return tables
+
+
+def parse_sections(markdown: str) -> List[SectionSpan]:
+    """
+    Returns one span per ATX heading. A section runs from its heading to the
+    next heading of the same or a higher level (or the end of the page).
+    """
+    # Offsets de inicio de las líneas dentro de bloques de código
+    # (ahí no hay encabezados)
+    code_starts = set()
+    offset = 0
+    lines = markdown.splitlines(keepends=True)
+    for line, in_code in zip(lines, _code_lines(lines)):
+        if in_code:
+            code_starts.add(offset)
+        offset += len(line)
+    headings = [
+        (m.start(), len(m.group(1)), m.group(2).strip())
+        for m in _HEADING_RE.finditer(markdown)
+        if m.start() not in code_starts
+    ]
+    sections: List[SectionSpan] = []
+    for pos, (start, level, title) in enumerate(headings):
+        end = len(markdown)
+        for next_start, next_level, _ in headings[pos + 1:]:
+            if next_level <= level:
+                end = next_start
+                break
+        sections.append(SectionSpan(level=level, title=title, start=start, end=end))
+    return sections
+
+
+def markdown_to_text(markdown: str) -> str:
+    """Converts OCR markdown into plain text (tables become tab-separated lines)."""
+    out: List[str] = []
+    lines = markdown.splitlines()
+    for line, kind in zip(lines, _code_lines(lines)):
+        stripped = line.strip()
+        if kind == _CODE:
+            out.append(line.rstrip()) # El código se conserva tal cual
+            continue
+        if kind == _FENCE:
+            continue
+        if _TABLE_SEPARATOR_RE.match(stripped) and "-" in stripped:
+            continue
+        if stripped.startswith("|"):
+            line = "\t".join(_split_row(stripped))
+        line = _HEADING_RE.sub(r"\2", line)
+        line = _IMAGE_RE.sub("", line)
+        line = _LINK_RE.sub(r"\1", line)
+        line = _LIST_MARKER_RE.sub("", line)
+        line = re.sub(r"^\s*>\s?", "", line)
+        line = _EMPHASIS_RE.sub(r"\2", line)
+        out.append(line.rstrip())
+    text = "\n".join(out)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def find_image_references(markdown: str) -> List[ImageReference]:
+    """Returns the ``![alt](id)`` references found in the markdown, in order."""
+    return [
+        ImageReference(id=m.group(2), alt=m.group(1))
+        for m in _IMAGE_RE.finditer(markdown)
+    ]
+
+
+def process_page(index: int, markdown: str) -> ProcessedPage:
+    """Parses a single page. Image references are returned unresolved."""
+    return ProcessedPage(
+        index=index,
+        plain_text=markdown_to_text(markdown),
+        tables=parse_tables(markdown),
+        sections=parse_sections(markdown),
+        images=find_image_references(markdown),
+    )
+
+
+def _process_batch(batch: Sequence[PageJob]) -> List[ProcessedPage]:
+    # Se ejecuta en el proceso hijo: debe ser una función de módulo (picklable)
+    return [process_page(index, markdown) for index, markdown in batch]
+
+
+def _page_images(page: OcrPage) -> Dict[str, Dict[str, Any]]:
+    images: Dict[str, Dict[str, Any]] = {}
+    for image in page.images or []:
+        data = image if isinstance(image, dict) else getattr(image, "__dict__", {})
+        if data.get("id"):
+            images[data["id"]] = data
+    return images
+
+
+def _resolve_images(processed: ProcessedPage, page: OcrPage) -> ProcessedPage:
+    available = _page_images(page)
+    for ref in processed.images:
+        ref.image = available.get(ref.id)
+    return processed
+
+
+class PostProcessor:
+    """
+    Parallel post-processing stage for OCR results.
+
+    Pages are sent to a process pool in batches of ``batch_size``; only the
+    page index and markdown are shipped to the workers, and image
+    references are resolved against ``OcrPage.images`` back in this process
+    (so base64 payloads are never pickled).
+
+    Args:
+        max_workers: Size of the process pool (defaults to the CPU count).
+        batch_size: Number of pages per submitted batch.
+        executor: Optional executor to use instead of creating a process pool.
+            It is not shut down by :meth:`close`.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        batch_size: int = 16,
+        executor: Optional[Executor] = None,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self.batch_size = batch_size
+        self._owns_executor = executor is None
+        self._executor: Executor = (
+            executor or ProcessPoolExecutor(max_workers=max_workers)
+        )
+
+    async def __aenter__(self) -> "PostProcessor":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    async def process(self, result: OcrResult) -> List[ProcessedPage]:
+        """Post-processes every page of ``result``, preserving page order."""
+        return (await self.process_many([result]))[0]
+
+    async def process_many(
+        self, results: Iterable[OcrResult]
+    ) -> List[List[ProcessedPage]]:
+        """
+        Post-processes the pages of several results at once. Batches can mix
+        pages of different documents, which keeps the workers busy with many
+        small results.
+        """
+        results = list(results)
+        pages: List[Tuple[int, OcrPage]] = [
+            (doc_pos, page)
+            for doc_pos, result in enumerate(results)
+            for page in result.pages
+        ]
+        jobs: List[PageJob] = [(page.index, page.markdown) for _, page in pages]
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                self._executor, _process_batch, jobs[i:i + self.batch_size]
+            )
+            for i in range(0, len(jobs), self.batch_size)
+        ]
+        logger.debug("Post-processing %d pages in %d batches", len(jobs), len(futures))
+        batches = await asyncio.gather(*futures)
+
+        grouped: List[List[ProcessedPage]] = [[] for _ in results]
+        processed_pages = (processed for batch in batches for processed in batch)
+        for (doc_pos, page), processed in zip(pages, processed_pages):
+            grouped[doc_pos].append(_resolve_images(processed, page))
+        return grouped
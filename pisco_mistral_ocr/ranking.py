@@ -0,0 +1,72 @@
+# pisco_mistral_ocr/ranking.py
+"""
+Ranking léxico local (BM25) de páginas OCR frente a una pregunta.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, List, Sequence, Tuple
+
+from .postprocess import markdown_to_text
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases, strips diacritics and splits on word characters."""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(ch for ch in normalized if not unicodedata.combining(ch))
+    return [token for token in _TOKEN_RE.findall(normalized) if len(token) > 1]
+
+
+def bm25_scores(
+    query: str, documents: Sequence[str], k1: float = 1.5, b: float = 0.75
+) -> List[float]:
+    """Returns the Okapi BM25 score of every document for ``query``."""
+    query_terms = set(tokenize(query))
+    tokenized = [tokenize(doc) for doc in documents]
+    if not query_terms or not tokenized:
+        return [0.0] * len(documents)
+    avg_len = sum(len(tokens) for tokens in tokenized) / len(tokenized) or 1.0
+    doc_freq = Counter(
+        term for tokens in tokenized for term in set(tokens) & query_terms
+    )
+    n_docs = len(tokenized)
+
+    scores = []
+    for tokens in tokenized:
+        counts = Counter(tokens)
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (n_docs - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            norm = 1 - b + b * len(tokens) / avg_len
+            score += idf * tf * (k1 + 1) / (tf + k1 * norm)
+        scores.append(score)
+    return scores
+
+
+def select_relevant_pages(
+    question: str, pages: Sequence[Any], max_pages: int
+) -> List[Any]:
+    """
+    Picks the ``max_pages`` OCR pages most relevant to ``question`` and returns
+    them in document order. If no page shares a term with the question, the
+    first pages are returned.
+    """
+    if max_pages < 1:
+        raise ValueError("max_pages must be at least 1.")
+    if len(pages) <= max_pages:
+        return list(pages)
+    scores = bm25_scores(question, [markdown_to_text(page.markdown) for page in pages])
+    if not any(scores):
+        return list(pages[:max_pages])
+    ranked: List[Tuple[float, int]] = sorted(
+        ((score, pos) for pos, score in enumerate(scores)),
+        key=lambda item: (-item[0], item[1]),
+    )
+    chosen = sorted(pos for _, pos in ranked[:max_pages])
+    return [pages[pos] for pos in chosen]
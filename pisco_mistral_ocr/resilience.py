@@ -0,0 +1,211 @@
+# pisco_mistral_ocr/resilience.py
+"""
+Herramientas de resiliencia para el cliente: hedging de peticiones idempotentes
+y circuit breaker por endpoint.
+"""
+import asyncio
+import logging
+import math
+import re
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from .exceptions import ApiError, CircuitOpenError, NetworkError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Segmentos variables de la ruta (IDs de archivo) que no deben separar endpoints
+_FILE_ID_RE = re.compile(r"^/files/[^/]+")
+
+
+def endpoint_key(method: str, endpoint: str) -> str:
+    """Normalizes a request into a per-endpoint key, e.g. ``GET /files/{id}/url``."""
+    if endpoint == "/files":
+        path = endpoint
+    else:
+        path = _FILE_ID_RE.sub("/files/{id}", endpoint)
+    return f"{method.upper()} {path}"
+
+
+class HedgingPolicy:
+    """
+    Configuration and latency history for hedged requests.
+
+    A hedged request sends a duplicate of an idempotent call when the first
+    attempt has not answered after the ``percentile`` latency observed for that
+    endpoint. Whichever attempt answers first wins and the other is cancelled.
+
+    Args:
+        percentile: Latency percentile (0-100) used as the hedging delay.
+        initial_delay: Delay in seconds used until ``min_samples`` latencies
+            have been recorded for an endpoint.
+        min_delay: Lower bound for the computed delay, in seconds.
+        max_delay: Upper bound for the computed delay, in seconds.
+        min_samples: Number of samples needed before trusting the percentile.
+        window: Number of recent latencies kept per endpoint.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        initial_delay: float = 2.0,
+        min_delay: float = 0.05,
+        max_delay: float = 30.0,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        if not 0 < percentile <= 100:
+            raise ValueError("percentile must be in the (0, 100] range.")
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.window = window
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, latency: float) -> None:
+        """Records the latency of a successful request to ``key``."""
+        samples = self._latencies.get(key)
+        if samples is None:
+            samples = self._latencies[key] = deque(maxlen=self.window)
+        samples.append(latency)
+
+    def delay_for(self, key: str) -> float:
+        """Returns the hedging delay in seconds for ``key``."""
+        samples = self._latencies.get(key)
+        if not samples or len(samples) < self.min_samples:
+            delay = self.initial_delay
+        else:
+            ordered = sorted(samples)
+            rank = max(math.ceil(self.percentile / 100 * len(ordered)) - 1, 0)
+            delay = ordered[rank]
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    async def run(
+        self,
+        key: str,
+        attempt: Callable[[], Awaitable[T]],
+        duplicate: Optional[Callable[[], Awaitable[T]]] = None,
+        record: bool = True,
+    ) -> T:
+        """
+        Runs ``attempt`` and, if it is still pending after the hedging delay,
+        ``duplicate`` (by default a second copy of ``attempt``). Returns the
+        first successful result.
+
+        If the first attempt to finish fails, the other one is awaited; the
+        error is only raised when every attempt has failed. With
+        ``record=False`` the caller records latencies itself (for example to
+        leave out time spent queueing before the request is sent).
+        """
+        started = time.monotonic()
+        tasks = [asyncio.ensure_future(attempt())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay_for(key))
+            if not done:
+                logger.debug(
+                    "Hedging request to %s after %.3fs",
+                    key, time.monotonic() - started,
+                )
+                tasks.append(asyncio.ensure_future((duplicate or attempt)()))
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if record:
+                            self.record(key, time.monotonic() - started)
+                        return task.result()
+                    error = error or task.exception()
+            assert error is not None
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail immediately with :class:`CircuitOpenError`. Once
+    ``recovery_time`` seconds have passed a single trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self, key: str, failure_threshold: int = 5, recovery_time: float = 30.0
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1.")
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError if the call must not be attempted."""
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed < self.recovery_time:
+                raise CircuitOpenError(self.key, self.recovery_time - elapsed)
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        # HALF_OPEN: solo se permite una llamada de prueba a la vez
+        if self._trial_in_flight:
+            raise CircuitOpenError(self.key, 0.0)
+        self._trial_in_flight = True
+
+    def on_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Circuit for %s closed again.", self.key)
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def on_cancel(self) -> None:
+        """Releases the half-open trial slot when the trial call is cancelled."""
+        self._trial_in_flight = False
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    "Circuit for %s opened after %d consecutive failures.",
+                    self.key, self.failures
+                )
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    @staticmethod
+    def counts_as_failure(error: BaseException) -> bool:
+        """
+        Only outages (network errors, 5xx, 429) trip the breaker, not client
+        errors.
+        """
+        if isinstance(error, NetworkError):
+            return True
+        if isinstance(error, ApiError):
+            return error.status_code >= 500 or error.status_code == 429
+        return False
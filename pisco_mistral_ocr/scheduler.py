@@ -0,0 +1,193 @@
+# pisco_mistral_ocr/scheduler.py
+"""
+Planificador de peticiones con colas justas ponderadas (WFQ) por clase de tráfico.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+DEFAULT = "default"
+BULK = "bulk"
+
+DEFAULT_WEIGHTS: Dict[str, float] = {INTERACTIVE: 8.0, DEFAULT: 4.0, BULK: 1.0}
+
+
+class TrafficClassStats:
+    """Queue depth and wait-time counters for one traffic class."""
+
+    __slots__ = ("queued", "in_flight", "dispatched", "total_wait", "max_wait")
+
+    def __init__(self) -> None:
+        self.queued = 0
+        self.in_flight = 0
+        self.dispatched = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "dispatched": self.dispatched,
+            "avg_wait": self.total_wait / self.dispatched if self.dispatched else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+class RequestScheduler:
+    """
+    Shares a global concurrency/rate budget between traffic classes.
+
+    Waiting requests are ordered with weighted fair queueing: every queued
+    request gets a virtual finish tag that grows by ``1 / weight`` per request
+    of its class, and the lowest tag is served first. A class with weight 8
+    therefore gets eight slots for every slot of a class with weight 1 while
+    both are backlogged, and an idle class never accumulates credit.
+
+    Args:
+        max_concurrency: Maximum number of requests in flight. None means unbounded.
+        weights: Weight per traffic class. Unknown classes get weight 1.0.
+        requests_per_second: Optional global rate limit applied at dispatch.
+        default_class: Class used when a call does not specify one.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        weights: Optional[Dict[str, float]] = None,
+        requests_per_second: Optional[float] = None,
+        default_class: str = DEFAULT,
+    ):
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive.")
+        self.max_concurrency = max_concurrency
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        if any(w <= 0 for w in self.weights.values()):
+            raise ValueError("Traffic class weights must be positive.")
+        self.requests_per_second = requests_per_second
+        self.default_class = default_class
+
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._last_tag: Dict[str, float] = {}
+        self._queues: Dict[str, Deque[Tuple[float, "asyncio.Future[None]"]]] = {}
+        self._stats: Dict[str, TrafficClassStats] = {}
+        self._next_dispatch_at = 0.0
+
+    def _class_stats(self, traffic_class: str) -> TrafficClassStats:
+        stats = self._stats.get(traffic_class)
+        if stats is None:
+            stats = self._stats[traffic_class] = TrafficClassStats()
+        return stats
+
+    def _has_capacity(self) -> bool:
+        return self.max_concurrency is None or self._in_flight < self.max_concurrency
+
+    def _has_waiters(self) -> bool:
+        return any(self._queues.values())
+
+    def _dispatch(self) -> None:
+        """Hands free slots to the queued requests with the lowest finish tags."""
+        while self._has_capacity():
+            best_class: Optional[str] = None
+            best_tag = 0.0
+            for traffic_class, queue in self._queues.items():
+                # Descartar esperas canceladas al frente de la cola
+                while queue and queue[0][1].done():
+                    queue.popleft()
+                if queue and (best_class is None or queue[0][0] < best_tag):
+                    best_class, best_tag = traffic_class, queue[0][0]
+            if best_class is None:
+                return
+            _, waiter = self._queues[best_class].popleft()
+            self._virtual_time = max(self._virtual_time, best_tag)
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    async def acquire(self, traffic_class: Optional[str] = None) -> str:
+        """Waits for a slot for ``traffic_class`` and returns the class used."""
+        traffic_class = traffic_class or self.default_class
+        stats = self._class_stats(traffic_class)
+        enqueued_at = time.monotonic()
+
+        if self._has_capacity() and not self._has_waiters():
+            self._in_flight += 1
+        else:
+            weight = self.weights.get(traffic_class, 1.0)
+            last = self._last_tag.get(traffic_class, 0.0)
+            tag = max(self._virtual_time, last) + 1.0 / weight
+            self._last_tag[traffic_class] = tag
+            waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+            queue = self._queues.setdefault(traffic_class, deque())
+            queue.append((tag, waiter))
+            stats.queued += 1
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Se nos asignó el slot justo antes de cancelar: devolverlo
+                    self._release_slot()
+                else:
+                    try:
+                        queue.remove((tag, waiter))
+                    except ValueError:
+                        pass
+                raise
+            finally:
+                stats.queued -= 1
+
+        try:
+            await self._wait_for_rate()
+        except asyncio.CancelledError:
+            self._release_slot()
+            raise
+
+        wait = time.monotonic() - enqueued_at
+        stats.in_flight += 1
+        stats.dispatched += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        if wait > 0.5:
+            logger.debug(
+                "Request in class %r waited %.3fs for a slot", traffic_class, wait
+            )
+        return traffic_class
+
+    async def _wait_for_rate(self) -> None:
+        if self.requests_per_second is None:
+            return
+        now = time.monotonic()
+        start_at = max(now, self._next_dispatch_at)
+        self._next_dispatch_at = start_at + 1.0 / self.requests_per_second
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    def _release_slot(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    def release(self, traffic_class: str) -> None:
+        """Releases a slot obtained with :meth:`acquire`."""
+        self._class_stats(traffic_class).in_flight -= 1
+        self._release_slot()
+
+    @asynccontextmanager
+    async def slot(self, traffic_class: Optional[str] = None) -> AsyncIterator[str]:
+        """Async context manager wrapping :meth:`acquire`/:meth:`release`."""
+        acquired = await self.acquire(traffic_class)
+        try:
+            yield acquired
+        finally:
+            self.release(acquired)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns queue depth, in-flight count and wait times per traffic class."""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
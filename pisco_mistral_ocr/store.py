@@ -0,0 +1,275 @@
+# pisco_mistral_ocr/store.py
+"""
+Almacén persistente de resultados OCR en SQLite con índice de texto completo FTS5.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from types import TracebackType
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from .exceptions import ConfigurationError, PiscoMistralOcrError
+from .models import SearchHit, SearchPageHit
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    content_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (content_hash, model)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    page_index INTEGER NOT NULL,
+    markdown TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    dpi INTEGER
+);
+CREATE INDEX IF NOT EXISTS pages_document_idx ON pages(document_id, page_index);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    markdown,
+    content='pages',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts(rowid, markdown) VALUES (new.id, new.markdown);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, markdown)
+    VALUES ('delete', old.id, old.markdown);
+END;
+"""
+
+# Los límites se aplican en SQL. bm25 se calcula para todas las coincidencias
+# (hace falta para ordenar), pero snippet() solo para las páginas devueltas
+_SEARCH_SQL = """
+WITH matches AS (
+    SELECT p.id AS page_id, p.document_id, p.page_index, bm25(pages_fts) AS score
+    FROM pages_fts
+    JOIN pages p ON p.id = pages_fts.rowid
+    WHERE pages_fts MATCH ?
+),
+ranked AS (
+    SELECT *,
+           ROW_NUMBER() OVER (
+               PARTITION BY document_id ORDER BY score, page_index
+           ) AS page_rank,
+           MIN(score) OVER (PARTITION BY document_id) AS doc_score
+    FROM matches
+),
+kept AS (
+    SELECT *, DENSE_RANK() OVER (ORDER BY doc_score, document_id) AS doc_rank
+    FROM ranked
+    WHERE page_rank <= ?
+)
+SELECT k.page_id, k.document_id, k.page_index, k.score,
+       d.source, d.content_hash, d.model, k.doc_score
+FROM kept k
+JOIN documents d ON d.id = k.document_id
+WHERE k.doc_rank <= ?
+ORDER BY k.doc_rank, k.page_rank
+"""
+_SNIPPET_SQL = """
+SELECT rowid, snippet(pages_fts, 0, '[', ']', '…', 12)
+FROM pages_fts
+WHERE pages_fts MATCH ? AND rowid IN ({})
+"""
+
+# (source, content_hash, model, [(page_index, markdown, width, height, dpi), ...])
+_PendingDocument = Tuple[Optional[str], str, str, List[Tuple[int, str, Any, Any, Any]]]
+
+
+def plain_query(text: str) -> str:
+    """
+    Turns plain text into an FTS5 query where every whitespace-separated term
+    must match.
+    """
+    # Cada término entre comillas: FTS5 no interpreta "-", "+", ":" ni palabras como NOT
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+def markdown_hash(result: Any) -> str:
+    """Content hash of an OCR result's text, used when the source bytes are unknown."""
+    digest = hashlib.sha256()
+    for page in result.pages:
+        digest.update(page.markdown.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class OcrResultStore:
+    """
+    Persists OCR results page by page into SQLite and indexes their markdown
+    with FTS5.
+
+    Writes are buffered and committed in a single transaction every
+    ``batch_size`` documents (or on :meth:`flush`/:meth:`close`). Storing a
+    document again with the same content hash and model replaces it.
+
+    Args:
+        path: SQLite database path (``":memory:"`` for a temporary store).
+        batch_size: Number of documents buffered before writing.
+    """
+
+    def __init__(self, path: str, batch_size: int = 32):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self.path = path
+        self.batch_size = batch_size
+        self._pending: List[_PendingDocument] = []
+        # El cliente escribe desde un executor: serializamos el acceso a la conexión
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        try:
+            self._conn.executescript(_SCHEMA)
+        except sqlite3.OperationalError as e:
+            self._conn.close()
+            raise ConfigurationError(f"SQLite build without FTS5 support: {e}") from e
+
+    def __enter__(self) -> "OcrResultStore":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def add(
+        self,
+        result: Any,
+        source: Optional[str] = None,
+        content_hash: Optional[str] = None,
+    ) -> None:
+        """
+        Buffers every page of ``result`` for writing.
+
+        Args:
+            result: An OcrResult (or any object with ``model`` and ``pages``).
+            source: Where the document came from (path or URL).
+            content_hash: Hash of the source bytes. Defaults to a hash of the
+                OCR markdown when the source bytes are not available.
+        """
+        pages = []
+        for page in result.pages:
+            dims: Dict[str, Any] = page.dimensions or {}
+            pages.append((
+                page.index, page.markdown,
+                dims.get("width"), dims.get("height"), dims.get("dpi"),
+            ))
+        content_hash = content_hash or markdown_hash(result)
+        with self._lock:
+            self._pending.append((source, content_hash, result.model, pages))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes all buffered documents in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            now = time.time()
+            with self._conn: # Una transacción por lote
+                for source, content_hash, model, pages in pending:
+                    self._conn.execute(
+                        "DELETE FROM documents WHERE content_hash = ? AND model = ?",
+                        (content_hash, model),
+                    )
+                    cursor = self._conn.execute(
+                        "INSERT INTO documents"
+                        " (source, content_hash, model, page_count, created_at)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (source, content_hash, model, len(pages), now),
+                    )
+                    document_id = cursor.lastrowid
+                    self._conn.executemany(
+                        "INSERT INTO pages"
+                        " (document_id, page_index, markdown, width, height, dpi)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        [(document_id,) + page for page in pages],
+                    )
+        logger.debug("Stored %d OCR results in %s", len(pending), self.path)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        pages_per_document: int = 3,
+        plain: bool = False,
+    ) -> List[SearchHit]:
+        """
+        Full-text search over stored pages.
+
+        Args:
+            query: An FTS5 query (e.g. ``'factura AND "Santiago"'``).
+            limit: Maximum number of documents returned.
+            pages_per_document: Maximum matching pages listed per document.
+            plain: Treat ``query`` as plain terms that must all appear, so
+                text like ``state-of-the-art`` or ``C++`` needs no escaping.
+
+        Returns:
+            Matching documents ordered by their best page's bm25 score, each
+            with its best matching pages and a highlighted snippet.
+
+        Raises:
+            PiscoMistralOcrError: If ``query`` is not valid FTS5 syntax.
+        """
+        if plain:
+            query = plain_query(query)
+            if not query:
+                return []
+        self.flush()
+        with self._lock:
+            try:
+                rows = self._conn.execute(
+                    _SEARCH_SQL, (query, pages_per_document, limit)
+                ).fetchall()
+                page_ids = [row[0] for row in rows]
+                snippets = dict(self._conn.execute(
+                    _SNIPPET_SQL.format(", ".join("?" * len(page_ids))),
+                    [query, *page_ids],
+                ).fetchall()) if page_ids else {}
+            except sqlite3.OperationalError as e:
+                # Sintaxis FTS5 inválida ("no such column", "syntax error")
+                raise PiscoMistralOcrError(
+                    f"Invalid full-text query {query!r}: {e}. "
+                    "Use plain=True to search plain terms."
+                ) from e
+
+        hits: Dict[int, SearchHit] = {}
+        for (page_id, document_id, page_index, score,
+             source, content_hash, model, doc_score) in rows:
+            hit = hits.get(document_id)
+            if hit is None:
+                hit = hits[document_id] = SearchHit(
+                    document_id=document_id, source=source, content_hash=content_hash,
+                    model=model, score=doc_score, pages=[],
+                )
+            hit.pages.append(
+                SearchPageHit(
+                    page_index=page_index, snippet=snippets[page_id], score=score
+                )
+            )
+        return list(hits.values())
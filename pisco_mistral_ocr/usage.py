@@ -0,0 +1,347 @@
+# pisco_mistral_ocr/usage.py
+"""
+Contabilidad de uso (páginas, bytes y tokens) y presupuestos por ventana de tiempo.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .exceptions import BudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+OCR = "ocr"
+CHAT = "chat"
+
+
+class UsageTotals:
+    """Accumulated usage for one aggregation key."""
+
+    __slots__ = (
+        "calls", "pages", "doc_bytes",
+        "prompt_tokens", "completion_tokens", "total_tokens",
+    )
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.pages = 0
+        self.doc_bytes = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class UsageEvent(NamedTuple):
+    timestamp: float
+    call_type: str
+    model: str
+    tag: Optional[str]
+    pages: int
+    tokens: int
+
+
+class UsageReservation:
+    """
+    Pages or tokens held against the budgets by an admitted call until its real
+    usage is recorded (or it fails). Releasing twice is a no-op.
+    """
+
+    __slots__ = ("_accountant", "call_type", "tag", "pages", "tokens", "released")
+
+    def __init__(
+        self,
+        accountant: "UsageAccountant",
+        call_type: str,
+        tag: Optional[str],
+        amount: int,
+    ):
+        self._accountant = accountant
+        self.call_type = call_type
+        self.tag = tag
+        self.pages = amount if call_type == OCR else 0
+        self.tokens = amount if call_type == CHAT else 0
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._accountant._release(self)
+
+
+class UsageBudget:
+    """
+    Hard limit on pages and/or tokens consumed within a rolling window.
+
+    Usage is only known once a call returns, so a budget is enforced before a
+    call starts. Each admitted call holds an estimate of its usage (at least one
+    page or token) until it finishes, so concurrent calls count too: if recorded
+    plus in-flight usage is already at or over the limit, the call is rejected
+    (``on_exceed="reject"``, raising :class:`BudgetExceededError`) or deferred
+    until usage leaves the window or in-flight calls finish (``on_exceed="defer"``).
+
+    Args:
+        max_pages: Maximum OCR pages per window, or None.
+        max_tokens: Maximum chat tokens per window, or None.
+        window_seconds: Length of the rolling window.
+        on_exceed: "reject" or "defer".
+        tag: If given, the budget only counts and applies to calls with this tag.
+    """
+
+    def __init__(
+        self,
+        max_pages: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        window_seconds: float = 3600.0,
+        on_exceed: str = "reject",
+        tag: Optional[str] = None,
+    ):
+        if max_pages is None and max_tokens is None:
+            raise ValueError("A budget needs max_pages and/or max_tokens.")
+        if on_exceed not in ("reject", "defer"):
+            raise ValueError("on_exceed must be 'reject' or 'defer'.")
+        self.max_pages = max_pages
+        self.max_tokens = max_tokens
+        self.window_seconds = window_seconds
+        self.on_exceed = on_exceed
+        self.tag = tag
+
+    def applies_to(self, tag: Optional[str]) -> bool:
+        return self.tag is None or self.tag == tag
+
+    def __repr__(self) -> str:
+        return (
+            f"UsageBudget(max_pages={self.max_pages}, max_tokens={self.max_tokens}, "
+            f"window_seconds={self.window_seconds}, tag={self.tag!r})"
+        )
+
+
+class UsageAccountant:
+    """
+    Sums usage per model, per call type and per tag for a client's lifetime,
+    keeps recent events for rolling throughput rates and enforces budgets.
+    """
+
+    def __init__(
+        self, budgets: Optional[List[UsageBudget]] = None, rate_window: float = 60.0
+    ):
+        self.budgets = list(budgets or [])
+        self.rate_window = rate_window
+        self._totals: Dict[Tuple[str, str, Optional[str]], UsageTotals] = {}
+        self._events: Deque[UsageEvent] = deque()
+        self._in_flight: Set[UsageReservation] = set()
+        self._waiters: List["asyncio.Future[None]"] = []
+        self._started_at = time.monotonic()
+        self._horizon = max([rate_window] + [b.window_seconds for b in self.budgets])
+
+    # --- Registro ---
+    def record(
+        self,
+        call_type: str,
+        model: str,
+        tag: Optional[str] = None,
+        pages: int = 0,
+        doc_bytes: int = 0,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ) -> None:
+        key = (call_type, model, tag)
+        totals = self._totals.get(key)
+        if totals is None:
+            totals = self._totals[key] = UsageTotals()
+        totals.calls += 1
+        totals.pages += pages
+        totals.doc_bytes += doc_bytes
+        totals.prompt_tokens += prompt_tokens
+        totals.completion_tokens += completion_tokens
+        totals.total_tokens += prompt_tokens + completion_tokens
+        now = time.monotonic()
+        self._events.append(
+            UsageEvent(
+                now, call_type, model, tag, pages, prompt_tokens + completion_tokens
+            )
+        )
+        self._prune(now)
+
+    def record_ocr(
+        self,
+        result: Any,
+        tag: Optional[str] = None,
+        reservation: Optional[UsageReservation] = None,
+    ) -> None:
+        """
+        Records the ``usage_info`` of an OCR result (falls back to the page
+        count), replacing the estimate held by ``reservation``.
+        """
+        usage = getattr(result, "usage_info", None)
+        pages = usage.pages_processed if usage is not None else len(result.pages)
+        doc_bytes = (usage.doc_size_bytes or 0) if usage is not None else 0
+        self.record(OCR, result.model, tag, pages=pages, doc_bytes=doc_bytes)
+        if reservation is not None:
+            reservation.release()
+
+    def record_chat(
+        self,
+        result: Any,
+        tag: Optional[str] = None,
+        reservation: Optional[UsageReservation] = None,
+    ) -> None:
+        """
+        Records the token ``usage`` of a chat completion result, replacing
+        ``reservation``.
+        """
+        usage = result.usage
+        self.record(
+            CHAT, result.model, tag,
+            prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens
+        )
+        if reservation is not None:
+            reservation.release()
+
+    def _prune(self, now: float) -> None:
+        while self._events and now - self._events[0].timestamp > self._horizon:
+            self._events.popleft()
+
+    # --- Consultas ---
+    def totals(self, by: Optional[str] = None) -> Dict[Any, Dict[str, int]]:
+        """
+        Returns accumulated usage grouped by ``"model"``, ``"call_type"`` or
+        ``"tag"``, or by the full ``(call_type, model, tag)`` key when ``by`` is None.
+        """
+        positions = {"call_type": 0, "model": 1, "tag": 2}
+        if by is not None and by not in positions:
+            raise ValueError("by must be one of 'model', 'call_type', 'tag' or None.")
+        grouped: Dict[Any, UsageTotals] = {}
+        for key, totals in self._totals.items():
+            group = key if by is None else key[positions[by]]
+            target = grouped.get(group)
+            if target is None:
+                target = grouped[group] = UsageTotals()
+            for name in UsageTotals.__slots__:
+                setattr(target, name, getattr(target, name) + getattr(totals, name))
+        return {group: totals.as_dict() for group, totals in grouped.items()}
+
+    def rates(self, window: Optional[float] = None) -> Dict[str, float]:
+        """Returns calls/s, pages/s and tokens/s over the last ``window`` seconds."""
+        window = min(window or self.rate_window, self._horizon)
+        now = time.monotonic()
+        self._prune(now)
+        # Al principio de la vida del cliente la ventana efectiva es más corta
+        elapsed = max(min(window, now - self._started_at), 1e-9)
+        recent = [e for e in self._events if now - e.timestamp <= window]
+        return {
+            "calls_per_second": len(recent) / elapsed,
+            "pages_per_second": sum(e.pages for e in recent) / elapsed,
+            "tokens_per_second": sum(e.tokens for e in recent) / elapsed,
+        }
+
+    def window_usage(self, budget: UsageBudget) -> Tuple[int, int]:
+        """Returns (pages, tokens) counted against ``budget`` in its current window."""
+        now = time.monotonic()
+        pages = tokens = 0
+        for event in self._events:
+            in_window = now - event.timestamp <= budget.window_seconds
+            if in_window and budget.applies_to(event.tag):
+                pages += event.pages
+                tokens += event.tokens
+        return pages, tokens
+
+    def in_flight_usage(self, budget: UsageBudget) -> Tuple[int, int]:
+        """Returns (pages, tokens) held by admitted calls that have not finished yet."""
+        pages = tokens = 0
+        for reservation in self._in_flight:
+            if budget.applies_to(reservation.tag):
+                pages += reservation.pages
+                tokens += reservation.tokens
+        return pages, tokens
+
+    # --- Presupuestos ---
+    def _estimate(self, call_type: str) -> int:
+        """Average pages (OCR) or tokens (chat) per recorded call, at least 1."""
+        calls = used = 0
+        for (kind, _, _), totals in self._totals.items():
+            if kind == call_type:
+                calls += totals.calls
+                used += totals.pages if call_type == OCR else totals.total_tokens
+        return max(1, -(-used // calls)) if calls else 1
+
+    def _release(self, reservation: UsageReservation) -> None:
+        self._in_flight.discard(reservation)
+        # Despertar a las llamadas diferidas: puede haber sitio otra vez
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _exhausted(
+        self, call_type: str, tag: Optional[str]
+    ) -> Optional[Tuple[UsageBudget, float]]:
+        """Returns the first exhausted budget for the call and when it frees up."""
+        now = time.monotonic()
+        self._prune(now)
+        for budget in self.budgets:
+            if not budget.applies_to(tag):
+                continue
+            pages, tokens = self.window_usage(budget)
+            reserved_pages, reserved_tokens = self.in_flight_usage(budget)
+            pages += reserved_pages
+            tokens += reserved_tokens
+            max_pages, max_tokens = budget.max_pages, budget.max_tokens
+            if call_type == OCR and max_pages is not None and pages >= max_pages:
+                limit, attr = max_pages, "pages"
+            elif call_type == CHAT and max_tokens is not None and tokens >= max_tokens:
+                limit, attr = budget.max_tokens, "tokens"
+            else:
+                continue
+            # Momento en que sale de la ventana suficiente uso para bajar del límite
+            # (si lo en vuelo basta para llenarlo, como mucho una ventana completa)
+            used = pages if attr == "pages" else tokens
+            retry_after = budget.window_seconds
+            for event in self._events:
+                expired = now - event.timestamp > budget.window_seconds
+                if expired or not budget.applies_to(event.tag):
+                    continue
+                used -= getattr(event, attr)
+                if used < limit:
+                    retry_after = event.timestamp + budget.window_seconds - now
+                    break
+            return budget, max(retry_after, 0.0)
+        return None
+
+    async def admit(
+        self, call_type: str, tag: Optional[str] = None, estimate: Optional[int] = None
+    ) -> UsageReservation:
+        """
+        Rejects or defers a call while a budget that applies to it is exhausted.
+        Once admitted, the call holds ``estimate`` pages or tokens (by default
+        the average per call so far, at least 1) until the returned reservation
+        is passed to :meth:`record_ocr`/:meth:`record_chat` or released.
+        """
+        while True:
+            exhausted = self._exhausted(call_type, tag)
+            if exhausted is None:
+                if estimate is None:
+                    estimate = self._estimate(call_type)
+                amount = max(1, estimate)
+                reservation = UsageReservation(self, call_type, tag, amount)
+                self._in_flight.add(reservation)
+                return reservation
+            budget, retry_after = exhausted
+            if budget.on_exceed == "reject":
+                raise BudgetExceededError(repr(budget), retry_after)
+            logger.info(
+                "Usage budget %r exhausted; deferring %s call %.1fs",
+                budget, call_type, retry_after,
+            )
+            # Se reintenta cuando sale uso de la ventana o termina una llamada en vuelo
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait([waiter], timeout=retry_after + 0.001)
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
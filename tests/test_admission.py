@@ -0,0 +1,124 @@
+# tests/test_admission.py
+import asyncio
+import pathlib
+import pytest
+import respx
+from httpx import Response
+
+from pisco_mistral_ocr import HedgingPolicy, PiscoMistralOcrClient
+from pisco_mistral_ocr.admission import ByteBudget
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+TEST_FILE_ID = "file_admission"
+MOCK_OCR_RESPONSE_PAYLOAD = {
+    "model": PiscoMistralOcrClient.DEFAULT_OCR_MODEL,
+    "pages": [{"index": 0, "markdown": "page"}],
+}
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_holds_back_until_released():
+    budget = ByteBudget(100)
+    first = await budget.reserve(60)
+    pending = asyncio.ensure_future(budget.reserve(60))
+    await asyncio.sleep(0)
+
+    assert not pending.done()
+    assert budget.stats()["waiting"] == 1
+    first.release()
+    second = await asyncio.wait_for(pending, timeout=1)
+
+    assert budget.stats()["in_use"] == 60
+    assert budget.stats()["peak"] == 60
+    second.release()
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_admits_oversized_alone_in_fifo_order():
+    budget = ByteBudget(100)
+    small = await budget.reserve(10)
+    huge = asyncio.ensure_future(budget.reserve(500))
+    await asyncio.sleep(0)
+    later_small = asyncio.ensure_future(budget.reserve(10))
+    await asyncio.sleep(0)
+
+    # El pequeño posterior no adelanta al grande que espera
+    assert not later_small.done()
+    small.release()
+    big = await asyncio.wait_for(huge, timeout=1)
+    assert not later_small.done()
+    big.release()
+    (await asyncio.wait_for(later_small, timeout=1)).release()
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_resize_and_cancel():
+    budget = ByteBudget(100)
+    reservation = await budget.reserve(80)
+    waiting = asyncio.ensure_future(budget.reserve(50))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    reservation.resize(20)
+    assert budget.in_use == 20
+    reservation.release()
+    reservation.release() # Idempotente
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_client_accounts_upload_and_response_bytes(tmp_path: pathlib.Path):
+    pdf = tmp_path / "big.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n" + b"0" * 3000)
+    seen_usage = []
+
+    def on_upload(request):
+        seen_usage.append(client.byte_budget_stats()["in_use"])
+        return Response(200, json={
+            "id": TEST_FILE_ID, "bytes": 3009, "created_at": 1, "filename": "big.pdf", "purpose": "ocr"
+        })
+
+    respx.post(f"{MISTRAL_BASE_URL}/files").mock(side_effect=on_upload)
+    respx.get(f"{MISTRAL_BASE_URL}/files/{TEST_FILE_ID}/url").mock(
+        return_value=Response(200, json={"url": "https://signed.url/x"})
+    )
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(return_value=Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD))
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, max_bytes_in_flight=1_000_000)
+
+    await client.ocr(str(pdf), include_image_base64=True, delete_after_processing=False)
+
+    # Durante la subida se reservan el archivo + la respuesta esperada en base64 (4/3)
+    assert seen_usage == [3009 + 3009 * 4 // 3]
+    stats = client.byte_budget_stats()
+    assert stats["in_use"] == 0
+    assert stats["admitted"] == 1
+    # Las siguientes URLs usan el tamaño de respuesta observado
+    assert client._expected_response_bytes("ocr_images", 0) < 1000
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_hedged_ocr_reserves_room_for_the_duplicate_response():
+    seen_usage = []
+
+    def on_ocr(request):
+        seen_usage.append(client.byte_budget_stats()["in_use"])
+        return Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD)
+
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=on_ocr)
+    client = PiscoMistralOcrClient(
+        api_key=FAKE_API_KEY, max_bytes_in_flight=10_000_000,
+        hedging_policy=HedgingPolicy(initial_delay=5.0),
+    )
+    expected = client._expected_response_bytes("ocr_text", 0)
+
+    await client.ocr("https://example.com/doc.pdf", include_image_base64=False)
+
+    assert seen_usage == [2 * expected]
+    assert client.byte_budget_stats()["in_use"] == 0
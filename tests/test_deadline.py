@@ -0,0 +1,128 @@
+# tests/test_deadline.py
+import asyncio
+import time
+
+import pytest
+import respx
+from httpx import Response
+
+from pisco_mistral_ocr import PiscoMistralOcrClient, Deadline, DeadlineExceededError, OcrResultStore
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+MOCK_OCR_PAYLOAD = {"model": "mistral-ocr-latest", "pages": [{"index": 0, "markdown": "# Hola"}]}
+
+
+def _slow(delay, payload):
+    async def respond(request):
+        await asyncio.sleep(delay)
+        return Response(200, json=payload)
+    return respond
+
+
+@pytest.mark.asyncio
+async def test_deadline_run_names_the_phase():
+    deadline = Deadline(0.05)
+    assert await deadline.run("fast", asyncio.sleep(0, result="ok")) == "ok"
+    with pytest.raises(DeadlineExceededError) as excinfo:
+        await deadline.run("slow", asyncio.sleep(1))
+    assert excinfo.value.phase == "slow"
+    # Un presupuesto agotado falla de inmediato, sin llegar a ejecutar el paso
+    with pytest.raises(DeadlineExceededError):
+        await deadline.run("late", asyncio.sleep(0))
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_ocr_deadline_exceeded_during_ocr_phase(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    respx.post(f"{MISTRAL_BASE_URL}/files").mock(return_value=Response(200, json={
+        "id": "f1", "bytes": 1, "created_at": 1, "filename": "doc.pdf", "purpose": "ocr"
+    }))
+    respx.get(f"{MISTRAL_BASE_URL}/files/f1/url").mock(
+        return_value=Response(200, json={"url": "https://signed/f1"})
+    )
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=_slow(1.0, MOCK_OCR_PAYLOAD))
+    delete_route = respx.delete(f"{MISTRAL_BASE_URL}/files/f1").mock(return_value=Response(204))
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+
+    with pytest.raises(DeadlineExceededError) as excinfo:
+        await client.ocr(str(pdf), timeout_budget=0.2)
+
+    assert excinfo.value.phase == "ocr"
+    # El archivo subido se borra aunque se haya agotado el presupuesto
+    await client.aclose()
+    assert delete_route.called
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_ocr_deadline_not_delayed_by_slow_deletion(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    respx.post(f"{MISTRAL_BASE_URL}/files").mock(return_value=Response(200, json={
+        "id": "f1", "bytes": 1, "created_at": 1, "filename": "doc.pdf", "purpose": "ocr"
+    }))
+    respx.get(f"{MISTRAL_BASE_URL}/files/f1/url").mock(
+        return_value=Response(200, json={"url": "https://signed/f1"})
+    )
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=_slow(1.0, MOCK_OCR_PAYLOAD))
+    delete_route = respx.delete(f"{MISTRAL_BASE_URL}/files/f1").mock(
+        side_effect=_slow(1.0, {"id": "f1", "object": "file", "deleted": True})
+    )
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with pytest.raises(DeadlineExceededError):
+        await client.ocr(str(pdf), timeout_budget=0.2)
+    # El error llega al agotarse el presupuesto, sin esperar al DELETE lento
+    assert loop.time() - started < 0.5
+
+    await client.aclose() # Espera el borrado que sigue en segundo plano
+    assert delete_route.called
+    assert not client._background_tasks
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_ask_text_mode_shares_budget_between_ocr_and_chat():
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=_slow(0.15, MOCK_OCR_PAYLOAD))
+    respx.post(f"{MISTRAL_BASE_URL}/chat/completions").mock(side_effect=_slow(0.15, {
+        "id": "c1", "created": 1, "model": "m",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "Hola"}}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }))
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+
+    # Cada paso cabe por separado en 0.25s, pero no ambos
+    with pytest.raises(DeadlineExceededError) as excinfo:
+        await client.ask("https://example.com/doc.pdf", "Saludo?", use_ocr_text=True, timeout_budget=0.25)
+    assert excinfo.value.phase == "chat"
+
+    result = await client.ask("https://example.com/doc.pdf", "Saludo?", use_ocr_text=True, timeout_budget=2)
+    assert result.choices[0].message.content == "Hola"
+
+
+class _SlowStore(OcrResultStore):
+    def add(self, result, source=None, content_hash=None):
+        time.sleep(0.5) # Simula el hash de un archivo grande y la escritura en SQLite
+        super().add(result, source, content_hash)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_result_store_write_does_not_delay_a_budgeted_call():
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=_slow(0.05, MOCK_OCR_PAYLOAD))
+    store = _SlowStore(":memory:")
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, result_store=store)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    result = await client.ocr("https://example.com/doc.pdf", timeout_budget=0.3)
+    assert loop.time() - started < 0.3
+    assert result.pages[0].markdown == "# Hola"
+
+    await client.aclose() # Espera la escritura que sigue en segundo plano
+    assert store.search("hola")[0].source == "https://example.com/doc.pdf"
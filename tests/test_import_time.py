@@ -0,0 +1,55 @@
+# tests/test_import_time.py
+import json
+import subprocess
+import sys
+
+import pytest
+
+import pisco_mistral_ocr
+
+# Presupuesto de arranque en frío para `import pisco_mistral_ocr` + excepciones.
+# Holgado a propósito para CI lentos: hoy ronda ~1 ms; cargar httpx y pydantic supera los 100 ms.
+IMPORT_BUDGET_SECONDS = 0.05
+
+
+def _run_isolated(code: str) -> dict:
+    """Ejecuta `code` en un intérprete nuevo (sin módulos cacheados) y devuelve su JSON."""
+    completed = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout)
+
+
+def test_package_import_is_lazy_and_within_budget():
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "from pisco_mistral_ocr import ApiError, ConfigurationError\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))\n"
+    )
+    # Tomamos el mejor de tres para no depender de ruido puntual del sistema
+    runs = [_run_isolated(code) for _ in range(3)]
+    modules = runs[0]["modules"]
+
+    assert "httpx" not in modules
+    assert "pydantic" not in modules
+    assert "pisco_mistral_ocr.client" not in modules
+    assert min(run["elapsed"] for run in runs) < IMPORT_BUDGET_SECONDS
+
+
+def test_models_import_does_not_load_httpx():
+    result = _run_isolated(
+        "import json, sys\n"
+        "from pisco_mistral_ocr import OcrResult\n"
+        "print(json.dumps({'httpx': 'httpx' in sys.modules}))\n"
+    )
+    assert result == {"httpx": False}
+
+
+def test_lazy_attributes_resolve():
+    for name in pisco_mistral_ocr.__all__:
+        assert getattr(pisco_mistral_ocr, name) is not None
+    assert "PiscoMistralOcrClient" in dir(pisco_mistral_ocr)
+    with pytest.raises(AttributeError):
+        pisco_mistral_ocr.DoesNotExist
@@ -0,0 +1,108 @@
+# tests/test_lean.py
+import json
+import tracemalloc
+
+import pytest
+import respx
+from httpx import Response
+
+from pisco_mistral_ocr import (
+    PiscoMistralOcrClient, LeanOcrResult, LeanOcrPage, LeanChatCompletionResult
+)
+from pisco_mistral_ocr.models import ChatCompletionResult, OcrResult
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+MOCK_OCR_PAYLOAD = {
+    "id": "ocr_1",
+    "model": "mistral-ocr-latest",
+    "pages": [
+        {"index": 0, "markdown": "# Contrato", "images": [], "dimensions": {"dpi": 200, "height": 10, "width": 8}},
+        {"index": 1, "markdown": "El arriendo es de 20 UF.", "confidence": 0.9},
+    ],
+    "usage_info": {"pages_processed": 2, "doc_size_bytes": 1234},
+}
+MOCK_CHAT_PAYLOAD = {
+    "id": "chatcmpl_1",
+    "created": 1700000000,
+    "model": PiscoMistralOcrClient.DEFAULT_CHAT_MODEL,
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "20 UF"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+}
+
+
+def test_lean_round_trips_to_pydantic_models():
+    lean = LeanOcrResult.model_validate(MOCK_OCR_PAYLOAD)
+
+    assert isinstance(lean.pages[0], LeanOcrPage)
+    assert lean.usage_info.pages_processed == 2
+    # Los campos desconocidos se conservan, como con extra='allow'
+    assert lean.pages[1].extra == {"confidence": 0.9}
+    assert lean.to_model() == OcrResult.model_validate(MOCK_OCR_PAYLOAD)
+
+    chat = LeanChatCompletionResult.model_validate(MOCK_CHAT_PAYLOAD)
+    assert chat.choices[0].message.content == "20 UF"
+    assert chat.to_model() == ChatCompletionResult.model_validate(MOCK_CHAT_PAYLOAD)
+
+
+def test_lean_keeps_api_field_named_extra():
+    payload = dict(MOCK_OCR_PAYLOAD, extra={"source": "scan"})
+    lean = LeanOcrResult.model_validate(payload)
+
+    # "extra" es un atributo interno, no un campo conocido de la API
+    assert lean.extra == {"extra": {"source": "scan"}}
+    assert lean.model_dump()["extra"] == {"source": "scan"}
+    assert lean.to_model() == OcrResult.model_validate(payload)
+
+
+def test_lean_base_class_is_abstract():
+    from pisco_mistral_ocr.lean import _LeanResult
+
+    with pytest.raises(TypeError):
+        _LeanResult()
+
+
+def test_lean_rejects_missing_required_fields():
+    with pytest.raises(ValueError, match="markdown"):
+        LeanOcrPage.model_validate({"index": 0})
+    payload = dict(MOCK_CHAT_PAYLOAD, choices=[{"index": 0, "message": {"role": "assistant"}}])
+    with pytest.raises(ValueError, match="LeanChatMessage is missing required fields: content"):
+        LeanChatCompletionResult.model_validate(payload)
+
+
+def test_lean_pages_use_less_memory_than_models():
+    raw = json.dumps(dict(MOCK_OCR_PAYLOAD, pages=[
+        {"index": i, "markdown": f"Página {i}", "images": [], "dimensions": {"dpi": 200, "height": 10, "width": 8}}
+        for i in range(2000)
+    ]))
+
+    def retained(model):
+        tracemalloc.start()
+        result = model.model_validate(json.loads(raw))
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del result
+        return size
+
+    assert retained(LeanOcrResult) < retained(OcrResult)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_ocr_and_ask_lean_mode():
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(return_value=Response(200, json=MOCK_OCR_PAYLOAD))
+    respx.post(f"{MISTRAL_BASE_URL}/chat/completions").mock(
+        return_value=Response(200, json=MOCK_CHAT_PAYLOAD)
+    )
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+
+    result = await client.ocr("https://example.com/doc.pdf", lean=True)
+    answer = await client.ask("https://example.com/doc.pdf", "¿Arriendo?", ocr_result=result, lean=True)
+
+    assert isinstance(result, LeanOcrResult)
+    assert isinstance(answer, LeanChatCompletionResult)
+    assert answer.choices[0].message.content == "20 UF"
+    # El registro de uso acepta los resultados ligeros igual que los modelos
+    totals = client.usage.totals(by="call_type")
+    assert totals["ocr"]["pages"] == 2
+    assert totals["chat"]["prompt_tokens"] == 10
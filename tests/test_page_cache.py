@@ -0,0 +1,241 @@
+# tests/test_page_cache.py
+import io
+import pathlib
+import threading
+import time
+import pytest
+import respx
+from httpx import Response
+
+pypdf = pytest.importorskip("pypdf")
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, TextStringObject
+
+from pisco_mistral_ocr import DeadlineExceededError, OcrPipeline, PiscoMistralOcrClient, PageCache
+from pisco_mistral_ocr.models import OcrResult
+from pisco_mistral_ocr.page_cache import page_fingerprints
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+
+
+def _write_pdf(path: pathlib.Path, texts):
+    """PDF con una página por texto; el texto va en el stream de contenido."""
+    writer = pypdf.PdfWriter()
+    for text in texts:
+        page = writer.add_blank_page(width=200, height=200)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 10 100 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject()
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def _mock_ocr(sent_pages):
+    """Simula /files + /ocr devolviendo una página por página del PDF subido."""
+    uploaded = {}
+
+    def upload(request):
+        body = request.content
+        pdf_bytes = body[body.index(b"%PDF"):body.rindex(b"%%EOF") + 5]
+        uploaded["texts"] = [
+            p.get_contents().get_data().decode().split("(")[1].split(")")[0]
+            for p in pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages
+        ]
+        return Response(200, json={"id": "f1", "bytes": 1, "created_at": 1, "filename": "x.pdf", "purpose": "ocr"})
+
+    def ocr(request):
+        texts = uploaded["texts"]
+        sent_pages.append(texts)
+        return Response(200, json={
+            "model": "mistral-ocr-latest",
+            "pages": [{"index": i, "markdown": f"# {t}"} for i, t in enumerate(texts)],
+            "usage_info": {"pages_processed": len(texts)},
+        })
+
+    respx.post(f"{MISTRAL_BASE_URL}/files").mock(side_effect=upload)
+    respx.get(f"{MISTRAL_BASE_URL}/files/f1/url").mock(return_value=Response(200, json={"url": "https://signed/f1"}))
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=ocr)
+    respx.delete(f"{MISTRAL_BASE_URL}/files/f1").mock(return_value=Response(204))
+
+
+def test_fingerprints_ignore_whitespace_and_detect_changes(tmp_path: pathlib.Path):
+    a = page_fingerprints(_write_pdf(tmp_path / "a.pdf", ["Cover", "Terms", "Cover"]))
+    b = page_fingerprints(_write_pdf(tmp_path / "b.pdf", ["Other", "Terms"]))
+
+    assert a[0] == a[2]
+    assert a[1] == b[1]
+    assert len({a[0], a[1], b[0]}) == 3
+
+
+
+def _write_form_pdf(path: pathlib.Path, value: str, contents: bool = True):
+    """Plantilla idéntica cuyo único cambio es el valor escrito en una anotación."""
+    writer = pypdf.PdfWriter()
+    page = writer.add_blank_page(width=200, height=200)
+
+    def stream(data, **entries):
+        obj = DecodedStreamObject()
+        obj.set_data(data.encode())
+        obj.update({NameObject(k): v for k, v in entries.items()})
+        return writer._add_object(obj)
+
+    # La apariencia dibuja un Form XObject anidado que contiene el texto
+    inner = stream(f"BT ({value}) Tj ET", **{"/Type": NameObject("/XObject"), "/Subtype": NameObject("/Form")})
+    resources = DictionaryObject({NameObject("/XObject"): DictionaryObject({NameObject("/Fm0"): inner})})
+    appearance = stream("/Fm0 Do", **{"/Subtype": NameObject("/Form"), "/Resources": resources})
+    annot = DictionaryObject({
+        NameObject("/Type"): NameObject("/Annot"),
+        NameObject("/Subtype"): NameObject("/FreeText"),
+        NameObject("/AP"): DictionaryObject({NameObject("/N"): appearance}),
+    })
+    if contents:
+        annot[NameObject("/Contents")] = TextStringObject(value)
+    page[NameObject("/Annots")] = ArrayObject([writer._add_object(annot)])
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_fingerprints_include_annotations_and_nested_forms(tmp_path: pathlib.Path):
+    first = page_fingerprints(_write_form_pdf(tmp_path / "a.pdf", "Total: 100 USD"))
+    second = page_fingerprints(_write_form_pdf(tmp_path / "b.pdf", "Total: 999 USD"))
+    assert first != second
+    # Sin /Contents la diferencia solo está en el Form XObject anidado de la apariencia
+    first = page_fingerprints(_write_form_pdf(tmp_path / "c.pdf", "Total: 100 USD", contents=False))
+    second = page_fingerprints(_write_form_pdf(tmp_path / "d.pdf", "Total: 999 USD", contents=False))
+    assert first != second
+    assert first == page_fingerprints(_write_form_pdf(tmp_path / "e.pdf", "Total: 100 USD", contents=False))
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_only_unseen_pages_are_sent(tmp_path: pathlib.Path):
+    sent_pages = []
+    _mock_ocr(sent_pages)
+    cache = PageCache(directory=str(tmp_path / "cache"))
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, page_cache=cache)
+
+    first = await client.ocr(_write_pdf(tmp_path / "one.pdf", ["Cover", "Invoice 1", "Terms", "Cover"]))
+    second = await client.ocr(_write_pdf(tmp_path / "two.pdf", ["Cover", "Invoice 2", "Terms"]))
+
+    # La portada repetida dentro del mismo PDF se envía una sola vez
+    assert sent_pages == [["Cover", "Invoice 1", "Terms"], ["Invoice 2"]]
+    assert [p.markdown for p in first.pages] == ["# Cover", "# Invoice 1", "# Terms", "# Cover"]
+    assert [(p.index, p.markdown) for p in second.pages] == [(0, "# Cover"), (1, "# Invoice 2"), (2, "# Terms")]
+    assert isinstance(second, OcrResult)
+    assert client.usage.totals(by="call_type")["ocr"]["pages"] == 4
+    assert len(list((tmp_path / "cache").iterdir())) == 4
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fully_cached_pdf_makes_no_requests(tmp_path: pathlib.Path):
+    sent_pages = []
+    _mock_ocr(sent_pages)
+    cache_dir = str(tmp_path / "cache")
+    pdf = _write_pdf(tmp_path / "doc.pdf", ["A", "B"])
+    await PiscoMistralOcrClient(api_key=FAKE_API_KEY, page_cache=PageCache(cache_dir)).ocr(pdf)
+
+    # Un cliente nuevo con la misma carpeta de caché no necesita la API
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, page_cache=PageCache(cache_dir))
+    result = await client.ocr(pdf)
+
+    assert len(sent_pages) == 1
+    assert [p.markdown for p in result.pages] == ["# A", "# B"]
+    assert client.page_cache.hits == 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_unparseable_pdf_falls_back_to_whole_document(tmp_path: pathlib.Path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 not really a pdf %%EOF")
+    respx.post(f"{MISTRAL_BASE_URL}/files").mock(return_value=Response(
+        200, json={"id": "f1", "bytes": 1, "created_at": 1, "filename": "broken.pdf", "purpose": "ocr"}
+    ))
+    respx.get(f"{MISTRAL_BASE_URL}/files/f1/url").mock(return_value=Response(200, json={"url": "https://signed/f1"}))
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(return_value=Response(200, json={
+        "model": "mistral-ocr-latest", "pages": [{"index": 0, "markdown": "# Scan"}],
+    }))
+    respx.delete(f"{MISTRAL_BASE_URL}/files/f1").mock(return_value=Response(204))
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, page_cache=PageCache())
+
+    result = await client.ocr(str(broken))
+
+    assert [p.markdown for p in result.pages] == ["# Scan"]
+    assert len(client.page_cache) == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_pipeline_uses_the_page_cache(tmp_path: pathlib.Path):
+    sent_pages = []
+    _mock_ocr(sent_pages)
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, page_cache=PageCache())
+    await client.ocr(_write_pdf(tmp_path / "seed.pdf", ["Cover", "Terms"]))
+
+    results = await OcrPipeline(client).run([
+        _write_pdf(tmp_path / "same.pdf", ["Cover", "Terms"]),
+        _write_pdf(tmp_path / "new.pdf", ["Cover", "Invoice"]),
+    ])
+
+    assert sent_pages == [["Cover", "Terms"], ["Invoice"]]
+    assert [p.markdown for p in results[0].pages] == ["# Cover", "# Terms"]
+    assert [p.markdown for p in results[1].pages] == ["# Cover", "# Invoice"]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_cache_disk_io_runs_off_the_event_loop(tmp_path: pathlib.Path):
+    _mock_ocr([])
+    threads = []
+
+    class RecordingCache(PageCache):
+        def get(self, key):
+            threads.append(threading.current_thread())
+            return super().get(key)
+
+        def put(self, key, page):
+            threads.append(threading.current_thread())
+            super().put(key, page)
+
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, page_cache=RecordingCache(str(tmp_path / "c")))
+    await client.ocr(_write_pdf(tmp_path / "one.pdf", ["Cover", "Terms"]))
+    await client.ocr(_write_pdf(tmp_path / "two.pdf", ["Cover", "Invoice"]))
+
+    # Cuatro lecturas y tres escrituras, ninguna en el hilo del event loop
+    assert len(threads) == 7
+    assert threading.main_thread() not in threads
+
+
+def test_memory_is_bounded_by_bytes_but_pages_stay_on_disk(tmp_path: pathlib.Path):
+    image = {"id": "img-0", "image_base64": "A" * 4000}
+    cache = PageCache(directory=str(tmp_path), max_bytes=10000)
+    for i in range(5):
+        cache.put(f"k{i}", {"index": i, "markdown": f"# {i}", "images": [image]})
+
+    # Solo caben dos páginas de ~4KB en memoria; las más antiguas siguen en disco
+    assert len(cache) == 2
+    assert cache.nbytes <= 10000
+    assert cache.get("k0")["markdown"] == "# 0"
+    assert len(cache) == 2 and cache.nbytes <= 10000
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_page_assembly_counts_against_the_deadline(tmp_path: pathlib.Path):
+    _mock_ocr([])
+
+    class SlowCache(PageCache):
+        def put(self, key, page):
+            time.sleep(0.3) # Escritura lenta de una página con imágenes en base64
+            super().put(key, page)
+
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, page_cache=SlowCache())
+    pdf = _write_pdf(tmp_path / "doc.pdf", ["Cover", "Terms"])
+
+    with pytest.raises(DeadlineExceededError) as excinfo:
+        await client.ocr(pdf, timeout_budget=0.3)
+    assert excinfo.value.phase == "page_assembly"
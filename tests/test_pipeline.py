@@ -0,0 +1,171 @@
+# tests/test_pipeline.py
+import asyncio
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import respx
+from httpx import Response
+
+from pisco_mistral_ocr import PiscoMistralOcrClient, OcrPipeline, ApiError, PostProcessor
+from pisco_mistral_ocr.models import OcrResult
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+
+
+def _mock_api(events):
+    """Rutas simuladas que registran inicio/fin de cada subida y OCR."""
+    uploads = {"n": 0}
+
+    async def upload(request):
+        uploads["n"] += 1
+        file_id = f"file_{uploads['n']}"
+        events.append(("upload_start", file_id))
+        await asyncio.sleep(0.02)
+        events.append(("upload_end", file_id))
+        return Response(200, json={
+            "id": file_id, "bytes": 10, "created_at": 1, "filename": "x.pdf", "purpose": "ocr"
+        })
+
+    async def ocr(request):
+        events.append(("ocr_start", request.content))
+        await asyncio.sleep(0.05)
+        events.append(("ocr_end", request.content))
+        if b"broken" in request.content:
+            return Response(500, json={"message": "boom"})
+        return Response(200, json={"model": "mistral-ocr-latest", "pages": [{"index": 0, "markdown": "ok"}]})
+
+    respx.post(f"{MISTRAL_BASE_URL}/files").mock(side_effect=upload)
+    respx.get(url__regex=rf"{MISTRAL_BASE_URL}/files/(?P<file_id>[^/]+)/url").mock(
+        side_effect=lambda request, file_id: Response(200, json={"url": f"https://signed.url/{file_id}"})
+    )
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=ocr)
+    return respx.delete(url__regex=rf"{MISTRAL_BASE_URL}/files/[^/]+").mock(return_value=Response(204))
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_pipeline_overlaps_upload_and_ocr(tmp_path: pathlib.Path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"doc{i}.pdf"
+        path.write_bytes(b"%PDF-1.4 " + bytes([i]))
+        paths.append(str(path))
+    events = []
+    delete_route = _mock_api(events)
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+    pipeline = OcrPipeline(client, upload_concurrency=1, ocr_concurrency=1)
+
+    results = await pipeline.run(paths)
+
+    assert all(isinstance(result, OcrResult) for result in results)
+    assert delete_route.call_count == 3
+    # La segunda subida empieza antes de que termine el OCR del primer documento
+    first_ocr_end = next(i for i, e in enumerate(events) if e[0] == "ocr_end")
+    second_upload_start = [i for i, e in enumerate(events) if e[0] == "upload_start"][1]
+    assert second_upload_start < first_ocr_end
+
+    stats = pipeline.stats()
+    assert stats["upload"]["processed"] == 3
+    assert 0 < stats["ocr"]["utilisation"] <= 1
+    assert stats["delete"]["failed"] == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_pipeline_captures_errors_per_document(tmp_path: pathlib.Path):
+    events = []
+    delete_route = _mock_api(events)
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, max_bytes_in_flight=10_000_000)
+    pipeline = OcrPipeline(client, include_image_base64=False)
+
+    results = await pipeline.run([
+        "https://example.com/good.pdf",
+        "https://example.com/broken.pdf",
+        str(tmp_path / "missing.pdf"),
+    ])
+
+    assert isinstance(results[0], OcrResult)
+    assert isinstance(results[1], ApiError)
+    assert isinstance(results[2], ValueError)
+    assert not delete_route.called # Las URLs no se suben, no hay nada que borrar
+    stats = pipeline.stats()
+    assert stats["ocr"]["failed"] == 1
+    # missing.pdf falla en la subida: las etapas siguientes lo cuentan como omitido
+    assert stats["sign"]["processed"] == 2 and stats["sign"]["skipped"] == 1
+    assert stats["ocr"]["processed"] == 2 and stats["ocr"]["skipped"] == 1
+    assert stats["delete"]["processed"] == 3
+    assert client.byte_budget_stats()["in_use"] == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_pipeline_failing_source_iterable_leaves_no_tasks(tmp_path: pathlib.Path):
+    _mock_api([])
+    pipeline = OcrPipeline(PiscoMistralOcrClient(api_key=FAKE_API_KEY))
+
+    def sources():
+        yield "https://example.com/good.pdf"
+        raise RuntimeError("listing failed")
+
+    before = len(asyncio.all_tasks())
+    with pytest.raises(RuntimeError, match="listing failed"):
+        await pipeline.run(sources())
+    await asyncio.sleep(0)
+
+    assert len(asyncio.all_tasks()) == before
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_post_processing_stage_overlaps_network_work(tmp_path: pathlib.Path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"doc{i}.pdf"
+        path.write_bytes(b"%PDF-1.4 " + bytes([i]))
+        paths.append(str(path))
+    events = []
+    _mock_api(events)
+
+    class RecordingProcessor(PostProcessor):
+        async def process(self, result):
+            events.append(("post_start", None))
+            return await super().process(result)
+
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pipeline = OcrPipeline(
+            client, upload_concurrency=1, ocr_concurrency=1,
+            post_processor=RecordingProcessor(executor=executor),
+        )
+        results = await pipeline.run(paths)
+
+    assert all(isinstance(result, OcrResult) for result in results)
+    assert [pages[0].plain_text for pages in pipeline.processed()] == ["ok"] * 4
+    # El primer documento se parsea mientras los siguientes siguen en OCR
+    first_post = next(i for i, e in enumerate(events) if e[0] == "post_start")
+    last_ocr_end = max(i for i, e in enumerate(events) if e[0] == "ocr_end")
+    assert first_post < last_ocr_end
+    assert pipeline.stats()["postprocess"]["processed"] == 4
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_post_processing_failure_keeps_the_ocr_result(tmp_path: pathlib.Path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4 x")
+    _mock_api([])
+
+    class BrokenProcessor(PostProcessor):
+        async def process(self, result):
+            raise RuntimeError("parser bug")
+
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pipeline = OcrPipeline(client, post_processor=BrokenProcessor(executor=executor))
+        results = await pipeline.run([str(path)])
+
+    assert isinstance(results[0], OcrResult)
+    assert isinstance(pipeline.processed()[0], RuntimeError)
+    assert pipeline.stats()["postprocess"]["failed"] == 1
@@ -0,0 +1,90 @@
+# tests/test_postprocess.py
+import pytest
+
+from pisco_mistral_ocr.models import OcrResult
+from pisco_mistral_ocr.postprocess import (
+    PostProcessor, markdown_to_text, parse_sections, parse_tables
+)
+
+PAGE_MARKDOWN = """# Invoice
+
+Issued to **ACME** by [Pisco](https://example.com).
+
+## Items
+
+| Item | Qty | Price |
+|------|:---:|------:|
+| Widget | 2 | 10.00 |
+| Gadget \\| Pro | 1 |
+
+![img-0.jpeg](img-0.jpeg)
+
+## Totals
+
+Total: 20.00
+"""
+
+
+def test_parse_tables():
+    tables = parse_tables(PAGE_MARKDOWN)
+
+    assert len(tables) == 1
+    assert tables[0].headers == ["Item", "Qty", "Price"]
+    assert tables[0].rows == [["Widget", "2", "10.00"], ["Gadget | Pro", "1", ""]]
+
+
+def test_parse_sections():
+    sections = parse_sections(PAGE_MARKDOWN)
+
+    assert [(s.level, s.title) for s in sections] == [(1, "Invoice"), (2, "Items"), (2, "Totals")]
+    assert sections[0].end == len(PAGE_MARKDOWN)
+    assert PAGE_MARKDOWN[sections[1].start:sections[1].end].startswith("## Items")
+    assert "Totals" not in PAGE_MARKDOWN[sections[1].start:sections[1].end]
+
+
+def test_markdown_to_text():
+    text = markdown_to_text(PAGE_MARKDOWN)
+
+    assert text.startswith("Invoice\n\nIssued to ACME by Pisco.")
+    assert "Widget\t2\t10.00" in text
+    assert "img-0" not in text
+    assert "|" not in text.replace("Gadget | Pro", "")
+
+
+
+def test_markdown_to_text_keeps_ordinary_underscores_and_asterisks():
+    text = markdown_to_text(
+        "maria_del_carmen_rojas@acme.cl ... file_name_v2.pdf; 2 * 3 * 4 and **bold** _it_ `code`"
+    )
+    assert text == "maria_del_carmen_rojas@acme.cl ... file_name_v2.pdf; 2 * 3 * 4 and bold it code"
+
+
+def test_fenced_code_is_not_parsed():
+    markdown = "# Real\n\n```python\n# comment\n**not bold**\n```\n\n## Next\n"
+
+    assert [s.title for s in parse_sections(markdown)] == ["Real", "Next"]
+    assert markdown_to_text(markdown) == "Real\n\n# comment\n**not bold**\n\nNext"
+
+
+@pytest.mark.asyncio
+async def test_post_processor_runs_in_process_pool():
+    results = [
+        OcrResult(model="m", pages=[
+            {"index": 0, "markdown": PAGE_MARKDOWN,
+             "images": [{"id": "img-0.jpeg", "image_base64": "data:image/jpeg;base64,AAA"}]},
+            {"index": 1, "markdown": "Plain page"},
+        ]),
+        OcrResult(model="m", pages=[{"index": 0, "markdown": "# Other"}]),
+    ]
+
+    async with PostProcessor(max_workers=2, batch_size=2) as processor:
+        processed = await processor.process_many(results)
+
+    assert [len(pages) for pages in processed] == [2, 1]
+    first = processed[0][0]
+    assert first.index == 0
+    assert first.tables[0].headers == ["Item", "Qty", "Price"]
+    assert first.images[0].id == "img-0.jpeg"
+    assert first.images[0].image["image_base64"].endswith("AAA")
+    assert processed[0][1].plain_text == "Plain page"
+    assert processed[1][0].sections[0].title == "Other"
@@ -0,0 +1,86 @@
+# tests/test_ranking.py
+import json
+import pytest
+import respx
+from httpx import Response
+
+from pisco_mistral_ocr import PiscoMistralOcrClient
+from pisco_mistral_ocr.models import OcrResult
+from pisco_mistral_ocr.ranking import bm25_scores, select_relevant_pages, tokenize
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+MOCK_ASK_RESPONSE_PAYLOAD = {
+    "id": "chatcmpl_123",
+    "created": 1700000000,
+    "model": PiscoMistralOcrClient.DEFAULT_CHAT_MODEL,
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "20 UF"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+}
+
+LONG_RESULT = OcrResult(model="mistral-ocr-latest", pages=[
+    {"index": i, "markdown": f"Página {i}: cláusulas generales del contrato."} for i in range(100)
+])
+LONG_RESULT.pages[42].markdown = "## Renta\nEl **arriendo** mensual es de 20 UF."
+LONG_RESULT.pages[77].markdown = "Reajuste del arriendo según IPC."
+
+
+def test_tokenize_strips_diacritics():
+    assert tokenize("Cláusula ÚNICA, año 2024") == ["clausula", "unica", "ano", "2024"]
+
+
+def test_bm25_prefers_matching_pages():
+    scores = bm25_scores("monto del arriendo", ["nada aquí", "arriendo arriendo", "el arriendo"])
+    assert scores[0] == 0
+    assert scores[1] > scores[2] > 0
+
+
+def test_select_relevant_pages_keeps_document_order():
+    pages = select_relevant_pages("¿Cuál es el arriendo?", LONG_RESULT.pages, max_pages=2)
+    assert [page.index for page in pages] == [42, 77]
+    # Sin términos en común se usan las primeras páginas
+    fallback = select_relevant_pages("zzz", LONG_RESULT.pages, max_pages=3)
+    assert [page.index for page in fallback] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_ask_with_ocr_result_sends_only_relevant_text():
+    ask_route = respx.post(f"{MISTRAL_BASE_URL}/chat/completions").mock(
+        return_value=Response(200, json=MOCK_ASK_RESPONSE_PAYLOAD)
+    )
+    upload_route = respx.post(f"{MISTRAL_BASE_URL}/files")
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+
+    result = await client.ask(
+        "contrato.pdf", "¿Cuánto es el arriendo mensual?",
+        ocr_result=LONG_RESULT, max_context_pages=2,
+    )
+
+    assert result.choices[0].message.content == "20 UF"
+    assert not upload_route.called
+    payload = json.loads(ask_route.calls[0].request.content.decode())
+    content = payload["messages"][0]["content"]
+    assert all(part["type"] == "text" for part in content)
+    assert content[0]["text"] == "¿Cuánto es el arriendo mensual?"
+    assert [part["text"].splitlines()[0] for part in content[1:]] == ["[Page 43]", "[Page 78]"]
+    assert "document_page_limit" not in payload
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_ask_use_ocr_text_ocrs_on_demand():
+    ocr_route = respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(return_value=Response(200, json={
+        "model": "mistral-ocr-latest", "pages": [{"index": 0, "markdown": "Total: 10"}],
+    }))
+    ask_route = respx.post(f"{MISTRAL_BASE_URL}/chat/completions").mock(
+        return_value=Response(200, json=MOCK_ASK_RESPONSE_PAYLOAD)
+    )
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+
+    await client.ask("https://example.com/doc.pdf", "Total?", use_ocr_text=True)
+
+    ocr_payload = json.loads(ocr_route.calls[0].request.content.decode())
+    assert ocr_payload["include_image_base64"] is False
+    ask_payload = json.loads(ask_route.calls[0].request.content.decode())
+    assert ask_payload["messages"][0]["content"][1]["text"] == "[Page 1]\nTotal: 10"
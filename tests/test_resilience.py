@@ -0,0 +1,115 @@
+# tests/test_resilience.py
+import asyncio
+import pytest
+import respx
+from httpx import Response
+
+from pisco_mistral_ocr import PiscoMistralOcrClient, ApiError, CircuitOpenError
+from pisco_mistral_ocr.models import OcrResult
+from pisco_mistral_ocr.resilience import HedgingPolicy, endpoint_key
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+TEST_URL = "https://example.com/document.pdf"
+MOCK_OCR_RESPONSE_PAYLOAD = {
+    "model": PiscoMistralOcrClient.DEFAULT_OCR_MODEL,
+    "pages": [{"index": 0, "markdown": "# Hedged"}],
+}
+
+
+def test_endpoint_key_groups_file_ids():
+    assert endpoint_key("get", "/files/abc123/url") == "GET /files/{id}/url"
+    assert endpoint_key("DELETE", "/files/abc123") == "DELETE /files/{id}"
+    assert endpoint_key("POST", "/files") == "POST /files"
+
+
+def test_hedging_delay_uses_percentile():
+    policy = HedgingPolicy(percentile=90, initial_delay=5.0, min_samples=10, min_delay=0.0)
+    assert policy.delay_for("POST /ocr") == 5.0
+    for i in range(1, 11):
+        policy.record("POST /ocr", i / 10)
+    assert policy.delay_for("POST /ocr") == pytest.approx(0.9)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_hedged_ocr_returns_first_response():
+    """Una primera petición atascada se cubre con un duplicado más rápido."""
+    calls = []
+
+    async def slow_then_fast(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+        return Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD)
+
+    ocr_route = respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=slow_then_fast)
+    client = PiscoMistralOcrClient(
+        api_key=FAKE_API_KEY,
+        hedging_policy=HedgingPolicy(initial_delay=0.05, min_delay=0.01),
+    )
+
+    result = await asyncio.wait_for(client.ocr(TEST_URL), timeout=2)
+
+    # La petición cancelada no queda registrada en la ruta, contamos en el side effect
+    assert len(calls) == 2
+    assert ocr_route.called
+    assert isinstance(result, OcrResult)
+    assert result.pages[0].markdown == "# Hedged"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_circuit_breaker_fails_fast_after_threshold():
+    ocr_route = respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(
+        return_value=Response(503, json={"message": "Service Unavailable"})
+    )
+    client = PiscoMistralOcrClient(
+        api_key=FAKE_API_KEY, circuit_breaker_threshold=2, circuit_breaker_recovery_time=60
+    )
+
+    for _ in range(2):
+        with pytest.raises(ApiError):
+            await client.ocr(TEST_URL)
+    with pytest.raises(CircuitOpenError) as exc_info:
+        await client.ocr(TEST_URL)
+
+    assert ocr_route.call_count == 2
+    assert exc_info.value.endpoint == "POST /ocr"
+    assert client.circuit_states()["POST /ocr"] == "open"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_circuit_breaker_ignores_client_errors():
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(
+        return_value=Response(400, json={"message": "Bad Request"})
+    )
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, circuit_breaker_threshold=1)
+
+    for _ in range(3):
+        with pytest.raises(ApiError):
+            await client.ocr(TEST_URL)
+
+    assert client.circuit_states()["POST /ocr"] == "closed"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_circuit_breaker_half_open_recovers():
+    ocr_route = respx.post(f"{MISTRAL_BASE_URL}/ocr")
+    ocr_route.side_effect = [
+        Response(500, json={"message": "boom"}),
+        Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD),
+    ]
+    client = PiscoMistralOcrClient(
+        api_key=FAKE_API_KEY, circuit_breaker_threshold=1, circuit_breaker_recovery_time=0.05
+    )
+
+    with pytest.raises(ApiError):
+        await client.ocr(TEST_URL)
+    await asyncio.sleep(0.06)
+    result = await client.ocr(TEST_URL)
+
+    assert isinstance(result, OcrResult)
+    assert client.circuit_states()["POST /ocr"] == "closed"
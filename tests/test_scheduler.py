@@ -0,0 +1,145 @@
+# tests/test_scheduler.py
+import asyncio
+import pytest
+import respx
+from httpx import Response
+
+from pisco_mistral_ocr import HedgingPolicy, PiscoMistralOcrClient
+from pisco_mistral_ocr.scheduler import RequestScheduler
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+MOCK_OCR_RESPONSE_PAYLOAD = {
+    "model": PiscoMistralOcrClient.DEFAULT_OCR_MODEL,
+    "pages": [{"index": 0, "markdown": "page"}],
+}
+
+
+async def _run_backlog(scheduler, classes):
+    """Encola peticiones detrás de un slot ocupado y devuelve el orden de servicio."""
+    order = []
+    blocker = await scheduler.acquire("blocker")
+
+    async def job(traffic_class):
+        async with scheduler.slot(traffic_class):
+            order.append(traffic_class)
+
+    tasks = [asyncio.ensure_future(job(c)) for c in classes]
+    await asyncio.sleep(0)
+    scheduler.release(blocker)
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_weighted_fair_queueing_order():
+    scheduler = RequestScheduler(max_concurrency=1, weights={"interactive": 4, "bulk": 1})
+    order = await _run_backlog(scheduler, ["bulk"] * 8 + ["interactive"] * 4)
+
+    # Las interactivas, aunque llegaron después, se intercalan a razón de 4:1
+    assert order[:5].count("interactive") == 4
+    assert order[-3:] == ["bulk"] * 3
+
+
+@pytest.mark.asyncio
+async def test_scheduler_stats_and_cancellation():
+    scheduler = RequestScheduler(max_concurrency=1)
+    holder = await scheduler.acquire("bulk")
+    waiting = asyncio.ensure_future(scheduler.acquire("interactive"))
+    await asyncio.sleep(0)
+
+    assert scheduler.stats()["interactive"]["queue_depth"] == 1
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    scheduler.release(holder)
+
+    stats = scheduler.stats()
+    assert stats["interactive"]["queue_depth"] == 0
+    assert stats["bulk"]["in_flight"] == 0
+    assert stats["bulk"]["dispatched"] == 1
+    # El slot quedó libre: una nueva petición entra sin esperar
+    await asyncio.wait_for(scheduler.acquire("interactive"), timeout=1)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_client_interactive_jumps_bulk_backlog():
+    served = []
+    release = asyncio.Event()
+
+    async def handler(request):
+        served.append(request.content)
+        await release.wait()
+        return Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD)
+
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=handler)
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, max_concurrency=1)
+
+    bulk = [
+        asyncio.ensure_future(client.ocr(f"https://example.com/bulk{i}.pdf", traffic_class="bulk"))
+        for i in range(5)
+    ]
+    await asyncio.sleep(0.05)
+    interactive = asyncio.ensure_future(
+        client.ocr("https://example.com/user.pdf", traffic_class="interactive")
+    )
+    await asyncio.sleep(0.05)
+    stats = client.scheduler_stats()
+    assert stats["bulk"]["queue_depth"] == 4
+    assert stats["interactive"]["queue_depth"] == 1
+
+    release.set()
+    await asyncio.gather(interactive, *bulk)
+
+    # Solo la petición bulk que ya estaba en vuelo se atiende antes que la interactiva
+    assert b"user.pdf" in served[1]
+    assert client.scheduler_stats()["interactive"]["dispatched"] == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_hedged_duplicate_waits_for_its_own_slot():
+    in_flight = []
+    peak = []
+
+    async def handler(request):
+        in_flight.append(request)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.2)
+        in_flight.remove(request)
+        return Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD)
+
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=handler)
+    client = PiscoMistralOcrClient(
+        api_key=FAKE_API_KEY, max_concurrency=1,
+        hedging_policy=HedgingPolicy(initial_delay=0.05, min_delay=0.01),
+    )
+
+    await asyncio.wait_for(client.ocr("https://example.com/doc.pdf"), timeout=2)
+
+    # El duplicado queda en cola tras el intento original y nunca supera max_concurrency
+    assert max(peak) == 1
+    stats = client.scheduler_stats()["default"]
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_queue_wait_does_not_trigger_hedged_duplicates():
+    async def handler(request):
+        await asyncio.sleep(0.1)
+        return Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD)
+
+    ocr_route = respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=handler)
+    policy = HedgingPolicy(initial_delay=0.3, min_samples=1000)
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, max_concurrency=2, hedging_policy=policy)
+
+    await asyncio.gather(*(
+        client.ocr(f"https://example.com/bulk{i}.pdf", traffic_class="bulk") for i in range(20)
+    ))
+
+    # Solo la cola es lenta (hasta ~1s de espera): el servidor responde en 0.1s
+    assert ocr_route.call_count == 20
+    # Las latencias registradas son solo de red, sin la espera en el scheduler
+    assert max(policy._latencies["POST /ocr"]) < 0.3
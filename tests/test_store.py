@@ -0,0 +1,149 @@
+# tests/test_store.py
+import hashlib
+import pathlib
+import pytest
+import respx
+from httpx import Response
+
+from pisco_mistral_ocr import PiscoMistralOcrClient, OcrResultStore, PiscoMistralOcrError
+from pisco_mistral_ocr.models import OcrResult
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+TEST_FILE_ID = "file_store"
+
+
+def _result(*markdowns: str) -> OcrResult:
+    return OcrResult(model="mistral-ocr-latest", pages=[
+        {"index": i, "markdown": md, "dimensions": {"width": 612, "height": 792, "dpi": 72}}
+        for i, md in enumerate(markdowns)
+    ])
+
+
+def test_store_search_groups_pages_by_document(tmp_path: pathlib.Path):
+    with OcrResultStore(str(tmp_path / "ocr.db"), batch_size=10) as store:
+        store.add(_result("Factura emitida en Santiago", "Términos y condiciones"), source="a.pdf")
+        store.add(_result("Contrato de arriendo", "Pago mensual en Santiago", "santiago again"), source="b.pdf")
+        store.add(_result("Nada relevante"), source="c.pdf")
+
+        hits = store.search("santiago")
+
+    assert {hit.source for hit in hits} == {"a.pdf", "b.pdf"}
+    b_hit = next(hit for hit in hits if hit.source == "b.pdf")
+    assert sorted(page.page_index for page in b_hit.pages) == [1, 2]
+    assert "[Santiago]" in next(p.snippet for p in b_hit.pages if p.page_index == 1)
+
+
+def test_store_diacritics_and_replace_on_same_hash():
+    store = OcrResultStore(":memory:")
+    store.add(_result("Términos y condiciones"), source="v1.pdf", content_hash="h1")
+    store.add(_result("Versión nueva"), source="v2.pdf", content_hash="h1")
+
+    # Mismo hash y modelo: el documento se reemplaza, y el índice FTS con él
+    assert store.search("terminos") == []
+    hits = store.search("version")
+    assert len(hits) == 1 and hits[0].source == "v2.pdf"
+    store.close()
+
+
+def test_store_persists_across_connections(tmp_path: pathlib.Path):
+    path = str(tmp_path / "ocr.db")
+    with OcrResultStore(path) as store:
+        store.add(_result("Persisted page"), source="doc.pdf")
+
+    with OcrResultStore(path) as reopened:
+        assert reopened.search("persisted")[0].source == "doc.pdf"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_client_writes_results_to_store(tmp_path: pathlib.Path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 store test")
+    respx.post(f"{MISTRAL_BASE_URL}/files").mock(return_value=Response(200, json={
+        "id": TEST_FILE_ID, "bytes": 19, "created_at": 1, "filename": "doc.pdf", "purpose": "ocr"
+    }))
+    respx.get(f"{MISTRAL_BASE_URL}/files/{TEST_FILE_ID}/url").mock(
+        return_value=Response(200, json={"url": "https://signed.url/x"})
+    )
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(return_value=Response(200, json={
+        "model": "mistral-ocr-latest", "pages": [{"index": 0, "markdown": "Boleta de honorarios"}],
+    }))
+    store = OcrResultStore(":memory:")
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, result_store=store)
+
+    await client.ocr(str(pdf), delete_after_processing=False)
+    hits = store.search("honorarios")
+
+    assert len(hits) == 1
+    assert hits[0].source == str(pdf)
+    assert hits[0].content_hash == hashlib.sha256(pdf.read_bytes()).hexdigest()
+
+
+def test_store_plain_queries_and_invalid_syntax():
+    store = OcrResultStore(":memory:")
+    store.add(_result("A state-of-the-art parser written in C++."), source="a.pdf")
+
+    with pytest.raises(PiscoMistralOcrError, match="Invalid full-text query"):
+        store.search("state-of-the-art")
+    assert store.search("state-of-the-art", plain=True)[0].source == "a.pdf"
+    assert store.search("C++ parser", plain=True)[0].source == "a.pdf"
+    assert store.search("   ", plain=True) == []
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_client_aclose_flushes_buffered_results(tmp_path: pathlib.Path):
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(return_value=Response(200, json={
+        "model": "mistral-ocr-latest", "pages": [{"index": 0, "markdown": "Factura pendiente"}],
+    }))
+    path = str(tmp_path / "results.db")
+    store = OcrResultStore(path, batch_size=10)
+    async with PiscoMistralOcrClient(api_key=FAKE_API_KEY, result_store=store) as client:
+        await client.ocr("https://example.com/doc.pdf")
+
+    # Otra conexión ve el resultado sin que nadie haya cerrado el almacén
+    with OcrResultStore(path) as reopened:
+        assert reopened.search("factura")[0].source == "https://example.com/doc.pdf"
+
+
+class _CountingCursor:
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._connection.rows_read += len(rows)
+        return rows
+
+
+class _CountingConnection:
+    """Wraps a sqlite3 connection and counts the rows read back from queries."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.rows_read = 0
+
+    def execute(self, *args):
+        return _CountingCursor(self._conn.execute(*args), self)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_store_search_applies_limits_in_sql():
+    store = OcrResultStore(":memory:")
+    for doc in range(50):
+        store.add(_result(*(f"contrato número {doc} página {i}" for i in range(6))), source=f"{doc}.pdf")
+    store.flush()
+    expected = store.search("contrato", limit=50, pages_per_document=6)
+    assert len(expected) == 50 and all(len(hit.pages) == 6 for hit in expected)
+
+    counting = store._conn = _CountingConnection(store._conn)
+    hits = store.search("contrato", limit=2, pages_per_document=1)
+
+    # Solo vuelven las filas que se devuelven (y sus snippets), no las 300 coincidencias
+    assert [hit.source for hit in hits] == [hit.source for hit in expected[:2]]
+    assert [len(hit.pages) for hit in hits] == [1, 1]
+    assert counting.rows_read == 4
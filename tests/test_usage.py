@@ -0,0 +1,135 @@
+# tests/test_usage.py
+import asyncio
+import pytest
+import respx
+from httpx import Response
+
+from pisco_mistral_ocr import PiscoMistralOcrClient, ApiError, BudgetExceededError, UsageBudget
+from pisco_mistral_ocr.usage import UsageAccountant
+
+FAKE_API_KEY = "fake-test-key-no-secret"
+MISTRAL_BASE_URL = PiscoMistralOcrClient.DEFAULT_BASE_URL
+TEST_URL = "https://example.com/document.pdf"
+MOCK_OCR_RESPONSE_PAYLOAD = {
+    "model": PiscoMistralOcrClient.DEFAULT_OCR_MODEL,
+    "pages": [{"index": 0, "markdown": "a"}, {"index": 1, "markdown": "b"}],
+    "usage_info": {"pages_processed": 2, "doc_size_bytes": 1000},
+}
+MOCK_ASK_RESPONSE_PAYLOAD = {
+    "id": "chatcmpl_123",
+    "created": 1700000000,
+    "model": PiscoMistralOcrClient.DEFAULT_CHAT_MODEL,
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_client_accumulates_usage_per_model_type_and_tag():
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(return_value=Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD))
+    respx.post(f"{MISTRAL_BASE_URL}/chat/completions").mock(
+        return_value=Response(200, json=MOCK_ASK_RESPONSE_PAYLOAD)
+    )
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY)
+
+    await client.ocr(TEST_URL, tag="batch-1")
+    await client.ocr(TEST_URL, tag="batch-1")
+    await client.ask(TEST_URL, "?", tag="batch-2")
+
+    by_tag = client.usage.totals(by="tag")
+    assert by_tag["batch-1"]["pages"] == 4
+    assert by_tag["batch-1"]["doc_bytes"] == 2000
+    assert by_tag["batch-2"]["total_tokens"] == 15
+    by_type = client.usage.totals(by="call_type")
+    assert by_type["ocr"]["calls"] == 2
+    assert by_type["chat"]["prompt_tokens"] == 10
+    assert set(client.usage.totals(by="model")) == {
+        PiscoMistralOcrClient.DEFAULT_OCR_MODEL, PiscoMistralOcrClient.DEFAULT_CHAT_MODEL
+    }
+    rates = client.usage.rates()
+    assert rates["pages_per_second"] > 0
+    assert rates["tokens_per_second"] > 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_page_budget_rejects_once_exhausted():
+    ocr_route = respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(
+        return_value=Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD)
+    )
+    client = PiscoMistralOcrClient(
+        api_key=FAKE_API_KEY, usage_budgets=[UsageBudget(max_pages=3, tag="runaway")]
+    )
+
+    await client.ocr(TEST_URL, tag="runaway")
+    await client.ocr(TEST_URL, tag="runaway") # 2 < 3: admitida, deja el total en 4
+    with pytest.raises(BudgetExceededError) as exc_info:
+        await client.ocr(TEST_URL, tag="runaway")
+    await client.ocr(TEST_URL, tag="other") # El presupuesto solo aplica a su tag
+
+    assert ocr_route.call_count == 3
+    assert exc_info.value.retry_after > 0
+
+
+@pytest.mark.asyncio
+async def test_deferred_budget_waits_for_window():
+    accountant = UsageAccountant([UsageBudget(max_tokens=10, window_seconds=0.1, on_exceed="defer")])
+    accountant.record("chat", "m", prompt_tokens=8, completion_tokens=4)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await asyncio.wait_for(accountant.admit("chat"), timeout=2)
+    assert loop.time() - started >= 0.09
+    # Las llamadas OCR no se ven afectadas por un presupuesto de tokens
+    await asyncio.wait_for(accountant.admit("ocr"), timeout=0.01)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_page_budget_counts_calls_still_in_flight():
+    async def slow_ocr(request):
+        await asyncio.sleep(0.05)
+        return Response(200, json={**MOCK_OCR_RESPONSE_PAYLOAD, "usage_info": {"pages_processed": 1}})
+
+    ocr_route = respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=slow_ocr)
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, usage_budgets=[UsageBudget(max_pages=10)])
+
+    results = await asyncio.gather(
+        *(client.ocr(TEST_URL) for _ in range(50)), return_exceptions=True
+    )
+
+    # Cada llamada en vuelo reserva al menos una página: solo 10 llegan a /ocr
+    assert ocr_route.call_count == 10
+    assert sum(isinstance(r, BudgetExceededError) for r in results) == 40
+    assert client.usage.totals(by="call_type")["ocr"]["pages"] == 10
+    assert not client.usage._in_flight
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_failed_call_releases_its_usage_reservation():
+    respx.post(f"{MISTRAL_BASE_URL}/ocr").mock(side_effect=[
+        Response(500, json={"message": "boom"}), Response(200, json=MOCK_OCR_RESPONSE_PAYLOAD)
+    ])
+    client = PiscoMistralOcrClient(api_key=FAKE_API_KEY, usage_budgets=[UsageBudget(max_pages=1)])
+
+    with pytest.raises(ApiError):
+        await client.ocr(TEST_URL)
+    # La página reservada por la llamada fallida ya no cuenta contra el presupuesto
+    await client.ocr(TEST_URL)
+    with pytest.raises(BudgetExceededError):
+        await client.ocr(TEST_URL)
+
+
+@pytest.mark.asyncio
+async def test_deferred_call_wakes_when_in_flight_call_finishes():
+    accountant = UsageAccountant([UsageBudget(max_pages=1, on_exceed="defer")])
+    first = await accountant.admit("ocr")
+    waiting = asyncio.ensure_future(accountant.admit("ocr"))
+    await asyncio.sleep(0.01)
+
+    assert not waiting.done()
+    first.release() # La llamada falló: no registró uso
+    second = await asyncio.wait_for(waiting, timeout=1)
+    assert second.pages == 1